@@ -0,0 +1,52 @@
+"""Throughput of AsyncKangGridVec for 1, 2, 4, ... workers
+
+Usage: python -m benchmarks.bench_async_vector [--envs 4096] [--steps 200]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from kang_gridworld.envs import KangGridVec
+from kang_gridworld.envs.async_vector import AsyncKangGridVec
+
+
+def measure(env, num_envs, steps):
+    """Return world-steps per second of env over the given number of steps
+    """
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 4, size=(steps, num_envs))
+    env.reset()
+    start = time.perf_counter()
+    for step in range(steps):
+        env.step(actions[step])
+    return num_envs * steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--envs", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    rate = measure(KangGridVec(args.envs, seed=0), args.envs, args.steps)
+    print(f"in-process    : {rate:14,.0f} steps/s")
+
+    workers = 1
+    while workers <= args.max_workers:
+        env = AsyncKangGridVec(args.envs, num_workers=workers, seed=0)
+        try:
+            rate = measure(env, args.envs, args.steps)
+        finally:
+            env.close()
+        print(f"{workers:3d} worker(s) : {rate:14,.0f} steps/s")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Single-env step latency of the numpy and numba backends
+
+Usage: python -m benchmarks.bench_backends [--size 32] [--objects 16]
+
+Times KangGrid.step (with copy=False) for every observation encoding. The
+numba kernels are compiled, or loaded from their cache, before timing;
+that one-off cost is reported separately.
+"""
+
+import argparse
+import itertools
+import time
+import timeit
+
+from kang_gridworld.envs import KangGrid
+
+ENCODINGS = ("grid", "prox", "vision", "rgb")
+BACKENDS = ("numpy", "numba")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=32)
+    parser.add_argument("--objects", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=50000)
+    args = parser.parse_args()
+
+    for encoding in ENCODINGS:
+        latencies = {}
+        for backend in BACKENDS:
+            start = time.perf_counter()
+            env = KangGrid(seed=0, world_size=(args.size, args.size),
+                           number_of_objects=args.objects,
+                           observation=encoding, copy=False, backend=backend)
+            env.reset()
+            env.step(3)
+            warmup = time.perf_counter() - start
+            if env.env.backend != backend:
+                print(f"{encoding:7s} {backend:6s}: not installed")
+                continue
+            actions = itertools.cycle([3, 2, 1, 0, 3, 3, 2, 2])
+
+            def step():
+                if env.step(next(actions))[2]:
+                    env.reset()
+            latencies[backend] = timeit.timeit(
+                step, number=args.steps) / args.steps
+            print(f"{encoding:7s} {backend:6s}: "
+                  f"{latencies[backend] * 1e6:8.2f} us/step "
+                  f"(first step after {warmup:.2f} s)")
+        if len(latencies) == len(BACKENDS):
+            print(f"{encoding:7s} speedup: "
+                  f"{latencies['numpy'] / latencies['numba']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
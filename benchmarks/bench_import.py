@@ -0,0 +1,111 @@
+"""Startup cost of creating a kang-grid-v0 env in a fresh interpreter
+
+Usage: python -m benchmarks.bench_import [--budget-ms 15]
+
+Runs `import gym, kang_gridworld; gym.make('kang-grid-v0')` under
+python -X importtime and reports the import time of the package's own
+modules against a budget, plus the time spent in its dependencies. Exits
+with status 1 if the budget is exceeded or if a package module imports
+OpenCV (or another heavy module that is only needed lazily) itself.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# gym.make imports the entry point with importlib, which -X importtime does
+# not log, so the modules it loads are imported explicitly first
+STARTUP = ("import gym, kang_gridworld.envs.gym_mask; "
+           "gym.make('kang-grid-v0')")
+LAZY_MODULES = ("cv2", "multiprocessing", "cProfile", "numba")
+
+
+def parse_importtime(stderr):
+    """Return (module, self us, cumulative us, depth) rows, in import order
+    of completion, from python -X importtime output
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(own), int(cumulative), depth))
+    return rows
+
+
+def importers(rows, name):
+    """Return the modules that imported the given module
+
+    importtime prints a module after everything it imports, one level
+    deeper, so the importer is the next row that is shallower.
+    """
+    found = []
+    for index, (module, _, _, depth) in enumerate(rows):
+        if module != name:
+            continue
+        for parent, _, _, parent_depth in rows[index + 1:]:
+            if parent_depth < depth:
+                found.append(parent)
+                break
+    return found
+
+
+def measure(repeat):
+    """Run the startup in fresh interpreters, with bytecode cached
+
+    Returns:
+        list -- parse_importtime rows of the fastest run
+    """
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    best = None
+    with tempfile.TemporaryDirectory() as cache:
+        # the first run only fills the bytecode cache
+        for _ in range(repeat + 1):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-X",
+                 f"pycache_prefix={cache}", "-c", STARTUP],
+                env=env, stderr=subprocess.PIPE, text=True, check=True)
+            rows = parse_importtime(result.stderr)
+            total = sum(own for _, own, _, _ in rows)
+            if best is None or total < best[0]:
+                best = (total, rows)
+    return best[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=15.0,
+                        help="import time allowed for kang_gridworld itself")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = measure(args.repeat)
+    own = [(module, us) for module, us, _, _ in rows
+           if module.startswith("kang_gridworld")]
+    own_ms = sum(us for _, us in own) / 1000
+    total_ms = sum(us for _, us, _, _ in rows) / 1000
+
+    for module, us in sorted(own, key=lambda row: -row[1]):
+        print(f"  {module:40s} {us / 1000:8.2f} ms")
+    print(f"kang_gridworld modules : {own_ms:8.2f} ms "
+          f"(budget {args.budget_ms:.2f} ms)")
+    print(f"everything else        : {total_ms - own_ms:8.2f} ms")
+
+    status = 0 if own_ms <= args.budget_ms else 1
+    for name in LAZY_MODULES:
+        eager = [parent for parent in importers(rows, name)
+                 if parent.startswith("kang_gridworld")]
+        if eager:
+            print(f"{name} imported at startup by {', '.join(eager)}")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Clone + step + restore rates of a Gridworld, as a search agent uses them
+
+Usage: python -m benchmarks.bench_snapshot [--size 32] [--objects 16]
+
+Compares copy.deepcopy clones with get_state / set_state snapshots. Each
+iteration clones the world, takes --depth random steps from it and rolls
+back, like one rollout of a tree search.
+"""
+
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from kang_gridworld.envs import KangGrid
+
+
+def measure(rollout, iterations):
+    """Return rollouts per second"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        rollout()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=32)
+    parser.add_argument("--objects", type=int, default=16)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--compiled", action="store_true")
+    args = parser.parse_args()
+
+    env = KangGrid(seed=0, world_size=(args.size, args.size),
+                   number_of_objects=args.objects, compiled=args.compiled)
+    env.reset()
+    grid = env.env
+    actions = np.random.default_rng(0).integers(
+        0, 4, (args.iterations, args.depth)).tolist()
+    rollouts = iter(actions * 2)
+
+    def deepcopy_rollout():
+        clone = copy.deepcopy(grid)
+        for action in next(rollouts):
+            clone.move_agent(action)
+        clone.prox_map
+
+    def snapshot_rollout():
+        state = grid.get_state()
+        for action in next(rollouts):
+            grid.move_agent(action)
+        grid.prox_map
+        grid.set_state(state)
+
+    def snapshot_only():
+        grid.set_state(grid.get_state())
+
+    copies = measure(deepcopy_rollout, args.iterations)
+    snapshots = measure(snapshot_rollout, args.iterations)
+    print(f"deepcopy + {args.depth} steps      : {copies:12,.0f} rollouts/s")
+    print(f"get/set_state + {args.depth} steps : {snapshots:12,.0f} "
+          f"rollouts/s ({snapshots / copies:.1f}x)")
+    rate = measure(snapshot_only, args.iterations * 10)
+    print(f"get_state + set_state    : {rate:12,.0f} per second")
+
+
+if __name__ == "__main__":
+    main()
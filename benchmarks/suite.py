@@ -0,0 +1,217 @@
+"""Benchmarks of the gridworld hot paths, with JSON results and comparison
+
+Usage:
+  python -m benchmarks.suite run [-o results.json] [-k step] [--quick]
+  python -m benchmarks.suite compare baseline.json results.json
+
+Every benchmark runs for each (world size, object count) pair of the grid
+below. compare exits with status 1 when any benchmark got slower than the
+threshold, so it can gate a release.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import timeit
+
+import gym
+import numpy as np
+
+import kang_gridworld  # noqa: F401 -- registers kang-grid-v0
+from kang_gridworld.envs import KangGrid
+
+SIZES = (5, 32, 128)
+OBJECTS = (2, 16, 64)
+QUICK_SIZES = (5, 32)
+QUICK_OBJECTS = (2, 16)
+
+
+def make_env(size, objects):
+    return KangGrid(seed=0, world_size=(size, size),
+                    number_of_objects=objects)
+
+
+def bench_make(size, objects):
+    return lambda: gym.make('kang-grid-v0', world_size=(size, size),
+                            number_of_objects=objects, seed=0)
+
+
+def bench_reset(size, objects):
+    return make_env(size, objects).reset
+
+
+def bench_step(size, objects):
+    env = make_env(size, objects)
+    actions = itertools.cycle([3, 2, 1, 0, 3, 3, 2, 2])
+
+    def step():
+        _, _, done, _ = env.step(next(actions))
+        if done:
+            env.reset()
+    return step
+
+
+def bench_move_agent(size, objects):
+    grid = make_env(size, objects).env
+    actions = itertools.cycle([3, 2, 1, 0, 3, 3, 2, 2])
+    return lambda: grid.move_agent(next(actions))
+
+
+def bench_prox_map(size, objects):
+    grid = make_env(size, objects).env
+    return lambda: grid.calculate_prox_map((1, 0))
+
+
+def bench_grid_map(size, objects):
+    grid = make_env(size, objects).env
+    return lambda: grid.calculate_grid_map((1, 0))
+
+
+def bench_representation(size, objects):
+    grid = make_env(size, objects).env
+    return lambda: grid.get_representation(True, True)
+
+
+def bench_image(size, objects):
+    # render-free image generation: uint8 frames into a reused buffer
+    grid = make_env(size, objects).env
+    frame = np.empty((size, size, 3), dtype=np.uint8)
+    return lambda: grid.get_representation(True, True, out=frame,
+                                           dtype=np.uint8)
+
+
+def bench_vision(size, objects):
+    grid = make_env(size, objects).env
+    return lambda: grid.return_vision(2, 2)
+
+
+BENCHMARKS = {
+    "make": bench_make,
+    "reset": bench_reset,
+    "step": bench_step,
+    "move_agent": bench_move_agent,
+    "calculate_prox_map": bench_prox_map,
+    "calculate_grid_map": bench_grid_map,
+    "get_representation": bench_representation,
+    "image_uint8": bench_image,
+    "return_vision": bench_vision,
+}
+
+
+def time_call(function, repeat, min_time):
+    """Time a zero-argument callable like timeit's command line
+
+    Returns:
+        dict -- best and mean seconds per call, calls per second
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    times = [total / number for total in timer.repeat(repeat, number)]
+    return {"best": min(times), "mean": float(np.mean(times)),
+            "ops_per_sec": 1 / min(times), "number": number}
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(),
+            "processor": platform.processor()}
+
+
+def run(args):
+    sizes, objects = ((QUICK_SIZES, QUICK_OBJECTS) if args.quick
+                      else (SIZES, OBJECTS))
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        for size, count in itertools.product(sizes, objects):
+            if count > (size * size - 1) // 2:
+                continue
+            key = f"{name}[{size}x{size},K={count}]"
+            try:
+                results[key] = time_call(bench(size, count), args.repeat,
+                                         args.min_time)
+                print(f"{key:42s} {results[key]['ops_per_sec']:14,.0f} /s")
+            except Exception as error:
+                results[key] = {"error": repr(error)}
+                print(f"{key:42s} {'error':>14s}  {error!r}")
+
+    with open(args.output, "w") as output:
+        json.dump({"meta": metadata(), "results": results}, output,
+                  indent=2)
+    print(f"wrote {args.output}")
+
+
+def compare(args):
+    with open(args.baseline) as baseline, open(args.results) as results:
+        old = json.load(baseline)["results"]
+        new = json.load(results)["results"]
+
+    regressions = 0
+    print(f"{'benchmark':42s} {'baseline':>12s} {'results':>12s} "
+          f"{'change':>8s}")
+    for key in sorted(set(old) | set(new)):
+        before = old.get(key, {}).get("ops_per_sec")
+        after = new.get(key, {}).get("ops_per_sec")
+        if before is None or after is None:
+            flag = ""
+            if before is not None and "error" in new.get(key, {}):
+                flag = "  BROKEN"
+                regressions += 1
+            before, after = (
+                "-" if rate is None else f"{rate:,.0f}"
+                for rate in (before, after))
+            print(f"{key:42s} {before:>12s} {after:>12s}{flag}")
+            continue
+        change = after / before - 1
+        flag = ""
+        if change < -args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:42s} {before:12,.0f} {after:12,.0f} "
+              f"{change:+8.1%}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-o", "--output", default="benchmarks.json")
+    run_parser.add_argument("-k", "--filter", default=None,
+                            help="only run benchmarks containing this")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--min-time", type=float, default=0.2,
+                            help="seconds per repeat")
+    run_parser.add_argument("--quick", action="store_true",
+                            help="small worlds only")
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="allowed slowdown (default: 10%%)")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,27 @@
-from kang_gridworld.envs.gym_mask import KangGrid
+import importlib
+
+# public classes and the modules defining them; they are imported on first
+# use, so that gym.make only loads what KangGrid needs
+_EXPORTS = {
+    "KangGrid": "gym_mask",
+    "KangGridVec": "vector",
+    "StepRecorder": "telemetry",
+    "AsyncKangGridVec": "async_vector",
+    "PhaseTimer": "profiling",
+    "MultiAgentGridworld": "multi_agent",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{_EXPORTS[name]}")
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
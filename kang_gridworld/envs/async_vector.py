@@ -0,0 +1,232 @@
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+from gym import spaces
+from multiprocessing import shared_memory
+
+from .vector import KangGridVec
+
+_STEP = b"s"
+_RESET = b"r"
+_CLOSE = b"c"
+_DONE = b"k"
+
+
+def _attach(name, shape, dtype):
+    """Attach to a shared memory block created by AsyncKangGridVec
+
+    Returns:
+        SharedMemory, matrix -- the block and a numpy view of it
+    """
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _worker(connection, layout, start, stop, seed, env_kwargs):
+    """Step a KangGridVec over the worlds [start, stop) of the shared buffers
+
+    The pipe only carries one-byte commands; actions are read from and
+    results written to shared memory.
+    """
+    blocks = []
+    arrays = {}
+    for key, (name, shape, dtype) in layout.items():
+        block, array = _attach(name, shape, dtype)
+        blocks.append(block)
+        arrays[key] = array[start:stop]
+
+    env = KangGridVec(stop - start, seed=seed, **env_kwargs)
+    try:
+        while True:
+            command = connection.recv_bytes()
+            if command == _STEP:
+                observations, rewards, dones, info = env.step(
+                    arrays["actions"])
+                arrays["observations"][:] = observations
+                # like KangGridVec, the observations before any reset
+                arrays["terminal_observations"][:] = info.get(
+                    "terminal_observation", observations)
+                arrays["rewards"][:] = rewards
+                arrays["dones"][:] = dones
+            elif command == _RESET:
+                arrays["observations"][:] = env.reset()
+                arrays["dones"][:] = False
+            else:
+                break
+            connection.send_bytes(_DONE)
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+        connection.close()
+
+
+class AsyncKangGridVec:
+    """KangGridVec spread over worker processes
+
+    Each worker steps a KangGridVec holding a contiguous slice of the
+    worlds. Observations, rewards, dones and actions live in shared memory,
+    so a step only sends one byte to each worker and back. Worlds reset
+    automatically, exactly as in KangGridVec, including the
+    info["terminal_observation"] of steps that end an episode.
+    """
+
+    def __init__(self, num_envs, num_workers=None, seed=None, copy=True,
+                 context=None, **env_kwargs):
+        """Start the workers
+
+        Arguments:
+            num_envs {int} -- total number of worlds
+
+        Keyword Arguments:
+            num_workers {int} -- number of worker processes
+                (default: {min(num_envs, os.cpu_count())})
+            seed {int} -- root seed; every worker gets its own child seed
+                from np.random.SeedSequence(seed).spawn (default: {None})
+            copy {bool} -- return copies of the shared buffers rather than
+                views that the next step overwrites (default: {True})
+            context {string} -- multiprocessing start method
+                (default: {None})
+            env_kwargs -- forwarded to every worker's KangGridVec
+        """
+        if num_workers is None:
+            num_workers = min(num_envs, os.cpu_count())
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.copy = copy
+        self.closed = False
+        self._waiting = False
+
+        # a throwaway env gives the shapes and spaces of one world
+        template = KangGridVec(1, **env_kwargs)
+        self.observation_space = spaces.Box(
+            low=template.observation_space.low.min(),
+            high=template.observation_space.high.max(),
+            shape=(num_envs,) + template.observation_space.shape[1:],
+            dtype=template.observation_space.dtype)
+        self.action_space = spaces.MultiDiscrete(
+            [template.action_space.nvec[0]] * num_envs)
+
+        specs = {
+            "observations": (self.observation_space.shape, np.float64),
+            "terminal_observations": (self.observation_space.shape,
+                                      np.float64),
+            "rewards": ((num_envs,), np.float64),
+            "dones": ((num_envs,), np.bool_),
+            "actions": ((num_envs,), np.int64),
+        }
+        self._blocks = []
+        self._arrays = {}
+        layout = {}
+        for key, (shape, dtype) in specs.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            block = shared_memory.SharedMemory(create=True, size=size)
+            self._blocks.append(block)
+            self._arrays[key] = np.ndarray(shape, dtype=dtype,
+                                           buffer=block.buf)
+            layout[key] = (block.name, shape, dtype)
+
+        context = mp.get_context(context)
+        seeds = np.random.SeedSequence(seed).spawn(num_workers)
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self._connections = []
+        self._processes = []
+        for index in range(num_workers):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker, daemon=True,
+                args=(child, layout, bounds[index], bounds[index + 1],
+                      seeds[index], env_kwargs))
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+
+    def _send(self, command):
+        for connection in self._connections:
+            connection.send_bytes(command)
+
+    def _wait(self):
+        for connection in self._connections:
+            connection.recv_bytes()
+
+    def _output(self, key):
+        array = self._arrays[key]
+        return array.copy() if self.copy else array
+
+    def reset(self):
+        """Reset every world
+
+        Returns:
+            matrix -- (N, ...) batch of observations, see KangGridVec
+        """
+        self._send(_RESET)
+        self._wait()
+        return self._output("observations")
+
+    def step_async(self, actions):
+        """Start a step of every world without waiting for it
+
+        Arguments:
+            actions {array of int} -- one action index per world
+        """
+        if self._waiting:
+            raise Exception("Already waiting for a step to finish!")
+        self._arrays["actions"][:] = actions
+        self._send(_STEP)
+        self._waiting = True
+
+    def step_wait(self):
+        """Wait for the step started by step_async
+
+        Returns:
+            matrix, array, array, dict -- observations, rewards, dones, info;
+            see KangGridVec.step
+        """
+        if not self._waiting:
+            raise Exception("step_async was not called!")
+        self._wait()
+        self._waiting = False
+        dones = self._output("dones")
+        info = {}
+        if dones.any():
+            info["terminal_observation"] = self._output(
+                "terminal_observations")
+        return (self._output("observations"), self._output("rewards"),
+                dones, info)
+
+    def step(self, actions):
+        """Apply one action in every world, see KangGridVec.step
+
+        Arguments:
+            actions {array of int} -- one action index per world
+
+        Returns:
+            matrix, array, array, dict -- observations, rewards, dones, info
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        """Stop the workers and free the shared memory
+        """
+        if self.closed:
+            return
+        if self._waiting:
+            self._wait()
+        self._send(_CLOSE)
+        for process in self._processes:
+            process.join()
+        for connection in self._connections:
+            connection.close()
+        self._arrays = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
@@ -0,0 +1,15 @@
+def store_array(owner, name, value):
+    """Set an array attribute, copying into the existing array when its
+    shape and dtype match so that long-lived buffers are reused
+
+    Arguments:
+        owner {object} -- object holding the attribute
+        name {string} -- attribute name
+        value {matrix} -- new contents
+    """
+    current = getattr(owner, name, None)
+    if (current is not None and current.shape == value.shape and
+            current.dtype == value.dtype):
+        current[...] = value
+    else:
+        setattr(owner, name, value)
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+def object_blocks(x_coords, y_coords):
+    """Compute the part of the distance + contact tensor that does not
+    depend on the agent
+
+    Objects never move, so this can be computed once per layout. Any number
+    of leading world axes is supported.
+
+    Arguments:
+        x_coords {array} -- (..., K) x coordinate of each object
+        y_coords {array} -- (..., K) y coordinate of each object
+
+    Returns:
+        matrix, matrix, matrix -- (..., K + 1, K + 1) x map, y map and
+        contacts, with the agent row and column left at zero
+    """
+    x_coords = np.asarray(x_coords)
+    y_coords = np.asarray(y_coords)
+    size = x_coords.shape[-1] + 1
+    shape = x_coords.shape[:-1] + (size, size)
+    lower = np.tri(size - 1, k=-1, dtype=bool)
+    diagonal = np.arange(1, size)
+
+    # the row is the target object and the column the origin
+    delta_x = x_coords[..., None, :] - x_coords[..., :, None]
+    delta_y = y_coords[..., None, :] - y_coords[..., :, None]
+
+    map_x = np.zeros(shape)
+    map_y = np.zeros(shape)
+    contacts = np.zeros(shape)
+    map_x[..., 1:, 1:] = np.where(lower, delta_x, 0)
+    map_y[..., 1:, 1:] = np.where(lower, delta_y, 0)
+    map_x[..., diagonal, diagonal] = x_coords
+    map_y[..., diagonal, diagonal] = y_coords
+    contacts[..., 1:, 1:] = lower & (np.abs(delta_x) + np.abs(delta_y) <= 1)
+    return map_x, map_y, contacts
+
+
+def grid_maps(x_agent, y_agent, x_coords, y_coords, map_x, map_y,
+              perm_contacts):
+    """Complete the distance + contact tensor with the agent row and column
+
+    See the README for the format. Contacts already set in perm_contacts
+    (touching objects, consumed objects) are always kept.
+
+    Arguments:
+        x_agent {int or array} -- (...) agent x coordinate of each world
+        y_agent {int or array} -- (...) agent y coordinate of each world
+        x_coords {array} -- (..., K) x coordinate of each object
+        y_coords {array} -- (..., K) y coordinate of each object
+        map_x, map_y {matrix} -- (..., K + 1, K + 1) from object_blocks
+        perm_contacts {matrix} -- (..., K + 1, K + 1) permanent contacts
+
+    Returns:
+        matrix -- (..., K + 1, K + 1, 3) tensor of x map, y map and contacts
+    """
+    x_agent = np.asarray(x_agent)
+    y_agent = np.asarray(y_agent)
+    delta_x = x_agent[..., None] - x_coords
+    delta_y = y_agent[..., None] - y_coords
+
+    output = np.empty(map_x.shape + (3,))
+    output[..., 0] = map_x
+    output[..., 1] = map_y
+    output[..., 2] = perm_contacts
+    output[..., 0, 0, 0] = x_agent
+    output[..., 0, 0, 1] = y_agent
+    output[..., 1:, 0, 0] = delta_x
+    output[..., 1:, 0, 1] = delta_y
+    output[..., 1:, 0, 2] = np.maximum(
+        perm_contacts[..., 1:, 0], np.abs(delta_x) + np.abs(delta_y) <= 1)
+    return output
@@ -1,5 +1,40 @@
 import numpy as np
-import pickle as p
+
+from collections import namedtuple
+from time import perf_counter_ns
+
+from . import distance, storage, vision
+from .buffers import store_array
+from .items import CONSUMED, ItemStore
+from .spatial import ItemIndex
+
+# immutable snapshot of the mutable part of a Gridworld, see get_state.
+# consumed is a bitmask of consumed items (bit i is item i) and target the
+# cell the proximity map follows, which differs from the agent's cell after
+# a collision
+GridState = namedtuple("GridState", ("x_agent", "y_agent", "epoch",
+                                     "consumed", "target", "layout"))
+
+
+def _load_kernels(backend):
+    """Return the kernels module of a backend
+
+    Arguments:
+        backend {string} -- "numpy" or "numba"
+
+    Returns:
+        module -- kernels, or None for the numpy backend and when numba is
+        not installed
+    """
+    if backend == "numpy":
+        return None
+    if backend != "numba":
+        raise Exception(f"Unknown backend {backend!r}!")
+    try:
+        from . import kernels
+    except ImportError:
+        return None
+    return kernels
 
 
 class Gridworld:
@@ -22,14 +57,24 @@ class Gridworld:
         return self.epoch
 
     def _get_objects(self):
-        """Returns list of objects
+        """Returns the objects of the world
 
         Returns:
-            list -- see item_list object format
+            ItemStore -- live reward / x / y / flags columns of the objects
         """
-        return self.item_list
+        return self.items
+
+    @property
+    def item_list(self):
+        """Copy of the objects as rows of [reward, passable, xCoord, yCoord]
 
-    def __init__(self, worldSize, action_specs, parameters):
+        Returns:
+            matrix -- K x 4, see ItemStore.as_matrix
+        """
+        return self.items.as_matrix()
+
+    def __init__(self, worldSize, action_specs, parameters, compiled=False,
+                 backend="numpy"):
         """Create Gridworld.
 
         The indices go from 0..xSize - 1 and 0..ySize - 1
@@ -38,25 +83,172 @@ class Gridworld:
             xSize {int} -- size of matrix in axis 1
             ySize {int} -- size of matrix in axis 0
             objects {matrix; n x 3} -- objects to be placed on grid
+
+        Keyword Arguments:
+            compiled {bool} -- precompute the dynamics of the layout into
+                transition tables, turning move_agent into a table lookup
+                (default: {False})
+            backend {string} -- "numba" runs moves, proximity map shifts
+                and grid observations as compiled kernels (see kernels),
+                falling back to "numpy" when numba is not installed; the
+                backend in use is kept in self.backend (default: {"numpy"})
         """
         self.x_size = worldSize[0]
         self.y_size = worldSize[1]
-        self.representation = np.zeros(worldSize)
-        self.blocks = np.zeros(worldSize)
+        # reversed because its rows x columns
+        self.representation = np.zeros((self.y_size, self.x_size))
+        self.blocks = np.zeros((self.y_size, self.x_size))
+        self.item_index = ItemIndex(self.x_size, self.y_size)
+        self._cell_item = self.item_index.cell_item
         self.collision_penalty = parameters[1]
-        self.perm_contact = None
-
-        # form: [reward, passable (bool), xCoord, yCoord]
-        self.item_list = np.array(parameters[0])
+        self.compiled = compiled
+        self.kernels = _load_kernels(backend)
+        self.backend = "numpy" if self.kernels is None else backend
         self.epoch = 0
         self.ACTION_BANK = action_specs[0]
         self.ACTION_EFFECTS = action_specs[1]
-        # reversed because its rows x columns
+        self._effects = np.array(self.ACTION_EFFECTS)
+        self.does_agent_exist = False
+        self._palettes = {}
+        self._vision_pad = None
+        self._vision_padding = (0, 0)
+        self.items = None
+        # profiling.PhaseTimer, see KangGrid.set_profiler
+        self.profiler = None
+        # bumped whenever the objects change, see observations.Observer
+        self.layout_version = 0
+        # only bumped by new layouts, GridStates are valid until it changes
+        self._layout_serial = 0
+        self._build_layout(parameters[0])
+
+    def reset_layout(self, objects):
+        """Replace the objects of the world and remove the agent
+
+        The world's arrays are refilled in place rather than reallocated, as
+        long as the number of objects stays the same; call place_agent
+        afterwards.
+
+        Arguments:
+            objects {list or ItemStore} -- see item_list object format
+        """
+        self.epoch = 0
         self.does_agent_exist = False
-        for [value, canEnter, x_coord, y_coord] in parameters[0]:
-            self.representation[y_coord, x_coord] = value
-            if (not canEnter):
-                self.blocks[y_coord, x_coord] = 1
+        self._build_layout(objects)
+
+    def _build_layout(self, objects, rewards=None):
+        """Place objects on the grid and rebuild everything derived from them
+
+        Every cell holds at most one object, which moves, the spatial index
+        and the compiled tables rely on.
+
+        Arguments:
+            objects {list or ItemStore} -- see item_list object format
+
+        Keyword Arguments:
+            rewards {array of float} -- float64 rewards of the objects, in
+                place of their reward column, such as the rewards read by
+                storage.load_items (default: {None})
+        """
+        # rows of form: [reward, passable (bool), xCoord, yCoord]
+        if isinstance(objects, ItemStore):
+            given = objects.reward
+            cells = objects.y.astype(np.int64) * self.x_size + objects.x
+        else:
+            objects = np.asarray(objects).reshape(-1, 4)
+            given = objects[:, 0]
+            cells = (objects[:, 3] * self.x_size + objects[:, 2]).astype(
+                np.int64)
+        rewards = np.array(given if rewards is None else rewards,
+                           dtype=np.float64)
+        cells.sort()
+        if np.any(cells[1:] == cells[:-1]):
+            raise Exception("Objects placed on the same cell!")
+
+        self.layout_version += 1
+        self._layout_serial += 1
+        # only the cells of the previous objects can be non-empty
+        self._clear_cells(self.item_index.item_cells)
+        self.blocks.ravel()[self.item_index.item_cells] = 0
+
+        if self.items is None or self.items.shape != (len(objects),):
+            self.items = ItemStore(len(objects))
+        self.items.assign(objects)
+        # items.reward is float32 storage; observations and rewards are
+        # computed from these float64 copies of the given rewards, so that
+        # a reward of 0.1 comes back as 0.1. _reward is zeroed on consumption
+        store_array(self, "_layout_reward", rewards)
+        store_array(self, "_reward", rewards.copy())
+        # items consumed before a saved world was written stay consumed
+        consumed = np.flatnonzero(self.items.flags & CONSUMED)
+        self.items.reward[consumed] = 0
+        self._reward[consumed] = 0
+        x_coords = self.items.x
+        y_coords = self.items.y
+        self.item_index.build(x_coords, y_coords)
+        self.representation[y_coords, x_coords] = self._reward
+        blocked = ~self.items.passable
+        self.blocks[y_coords[blocked], x_coords[blocked]] = 1
+        if self._vision_pad is not None:
+            x_pad, y_pad = self._vision_padding
+            self._vision_pad[y_coords + y_pad, x_coords + x_pad] = \
+                self._reward
+
+        # objects don't move, so their part of the grid map is cached. Only
+        # the grid observation needs it, so it is built on first use
+        self._blocks_pending = True
+        for index in consumed:
+            self.item_index.discard(index)
+        self._consumed = sum(1 << int(index) for index in consumed)
+        if self.compiled:
+            self._compile()
+        if self.does_agent_exist:
+            self._build_proximity_map()
+
+    def _compile(self):
+        """Precompute the dynamics of the current layout
+
+        Cells are numbered y * xSize + x. For every (cell, action) pair this
+        stores whether the move is possible, the cell the agent ends in and
+        the clipped target used by the proximity map.
+
+        The bounds part of the tables only depends on the world size and is
+        computed once; the blocks part is only redone for layouts that have
+        (or replace one that had) impassable objects.
+        """
+        if getattr(self, "_target_cell", None) is None:
+            cells = np.arange(self.x_size * self.y_size)
+            effects = np.array(self.ACTION_EFFECTS)
+            x_end = (cells % self.x_size)[:, None] + effects[:, 0]
+            y_end = (cells // self.x_size)[:, None] + effects[:, 1]
+            x_clip = np.clip(x_end, 0, self.x_size - 1)
+            y_clip = np.clip(y_end, 0, self.y_size - 1)
+
+            self._in_bounds = (x_end == x_clip) & (y_end == y_clip)
+            self._target_cell = y_clip * self.x_size + x_clip
+            self._move_ok = self._in_bounds.copy()
+            self._next_cell = np.where(self._move_ok, self._target_cell,
+                                       cells[:, None])
+            self._compiled_blocks = False
+
+        has_blocks = not self.items.passable.all()
+        if has_blocks or self._compiled_blocks:
+            cells = np.arange(self.x_size * self.y_size)
+            np.logical_and(self._in_bounds, self.blocks[
+                self._target_cell // self.x_size,
+                self._target_cell % self.x_size] != 1, out=self._move_ok)
+            self._next_cell[...] = np.where(
+                self._move_ok, self._target_cell, cells[:, None])
+            self._compiled_blocks = has_blocks
+
+    def __getstate__(self):
+        # modules can't be copied or pickled, the kernels are reloaded
+        state = self.__dict__.copy()
+        state["kernels"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.kernels = _load_kernels(self.backend)
 
     def __str__(self):
         return self.get_representation(True, True)
@@ -78,7 +270,7 @@ class Gridworld:
             self.x_agent = x_coord
             self.y_agent = y_coord
             self.does_agent_exist = True
-            self.prox_map = self.calculate_prox_map((0, 0))
+            self._build_proximity_map()
 
     def distance_to_objects(self, x_coord, y_coord):
         """Return matrix with distance to relevant objects
@@ -88,13 +280,44 @@ class Gridworld:
             yCoord {int} -- yCoord to compare object to
 
         Returns:
-            matrix -- matrix of each item and it's value / x delta / y delta
+            matrix -- matrix of each passable item and it's value / x delta /
+            y delta
         """
 
-        distance_matrix = [[row[0], row[1] - x_coord, row[2] - y_coord]
-                           for row in self.item_list if row[1]]
+        passable = self.items.passable
+        distance_matrix = np.empty((np.count_nonzero(passable), 3))
+        distance_matrix[:, 0] = self._reward[passable]
+        np.subtract(self.items.x[passable], x_coord,
+                    out=distance_matrix[:, 1])
+        np.subtract(self.items.y[passable], y_coord,
+                    out=distance_matrix[:, 2])
         return distance_matrix
 
+    def item_at(self, x_coord, y_coord):
+        """Return the remaining item on a cell, in O(1)
+
+        Arguments:
+            x_coord {int} -- x coordinate of the cell
+            y_coord {int} -- y coordinate of the cell
+
+        Returns:
+            int -- row of the item in item_list, -1 if there is none
+        """
+        return self.item_index.item_at(x_coord, y_coord)
+
+    def nearest_item(self, x_coord, y_coord):
+        """Return the remaining item closest (in Manhattan distance) to a cell
+
+        Arguments:
+            x_coord {int} -- x coordinate of the cell
+            y_coord {int} -- y coordinate of the cell
+
+        Returns:
+            int, int -- row of the item in item_list and its distance, or
+            (-1, -1) if every item has been consumed
+        """
+        return self.item_index.nearest(x_coord, y_coord)
+
     def move_possible(self, xy_tuple):
         """Identify if a move is possible. Requires agent to be initialized
 
@@ -128,11 +351,192 @@ class Gridworld:
 
         """
         if (self.does_agent_exist):
+            if self.kernels is not None:
+                return self._kernel_move(action)
+            if self.compiled:
+                return self._compiled_move(action)
             self.update_proximity_map(self.ACTION_EFFECTS[action])
             return self.appropriate_move(self.ACTION_EFFECTS[action])
         else:
             raise Exception("Agent does not exist!")
 
+    def _compiled_move(self, action):
+        """move_agent through the precomputed transition tables
+
+        Arguments:
+            action {int} -- index of the action
+
+        Returns:
+            int -- Returns reward after action
+        """
+        cell = self.y_agent * self.x_size + self.x_agent
+        target = int(self._target_cell[cell, action])
+        self._prox_pending = (target % self.x_size, target // self.x_size)
+        self.epoch += 1
+        if not self._move_ok[cell, action]:
+            return self.collision_penalty
+
+        self.x_agent, self.y_agent = self._prox_pending
+        output = self.representation[self.y_agent, self.x_agent]
+        self._clear_cell(self.x_agent, self.y_agent)
+        item = self._cell_item[target]
+        if item >= 0 and not self.items.flags[item] & CONSUMED:
+            self._consume(item)
+        return output
+
+    def _kernel_move(self, action):
+        """move_agent through kernels.move_agent
+
+        Arguments:
+            action {int} -- index of the action
+
+        Returns:
+            int -- Returns reward after action
+        """
+        x_move, y_move = self.ACTION_EFFECTS[action]
+        (self.x_agent, self.y_agent, x_target, y_target, reward,
+         item) = self.kernels.move_agent(
+            int(self.x_agent), int(self.y_agent), x_move, y_move,
+            float(self.collision_penalty), self.blocks, self.representation,
+            self._cell_item)
+        self._prox_pending = (x_target, y_target)
+        self.epoch += 1
+        # only item cells are non-empty, so only they need clearing in the
+        # vision pad
+        if item >= 0:
+            self._clear_cell(self.x_agent, self.y_agent)
+            self._consume(item)
+        return reward
+
+    def _clear_cell(self, x_coord, y_coord):
+        """Clear the item at a cell from the representation and its copies
+
+        Arguments:
+            x_coord {int} -- x coordinate of the cell
+            y_coord {int} -- y coordinate of the cell
+        """
+        self.representation[y_coord, x_coord] = 0
+        if self._vision_pad is not None:
+            self._vision_pad[y_coord + self._vision_padding[1],
+                             x_coord + self._vision_padding[0]] = 0
+
+    def _clear_cells(self, cells):
+        """Clear many cells at once, see _clear_cell
+
+        Arguments:
+            cells {array of int} -- cells numbered y * xSize + x
+        """
+        self.representation.ravel()[cells] = 0
+        if self._vision_pad is not None:
+            self._vision_pad[cells // self.x_size + self._vision_padding[1],
+                             cells % self.x_size +
+                             self._vision_padding[0]] = 0
+
+    def _consume(self, index):
+        """Mark an item as consumed
+
+        Arguments:
+            index {int} -- row of the item in item_list
+        """
+        self.items.consume(index)
+        self._reward[index] = 0
+        self._consumed |= 1 << int(index)
+        self.item_index.discard(index)
+        # consumed objects are always considered contacting
+        if not self._blocks_pending:
+            self._perm_contacts[index + 1, 0] = 1
+        # remove item from proximity map
+        if self._prox_index[index] >= 0:
+            self._prox_map[self._prox_index[index], 0] = 0
+
+    def _consume_many(self, indices):
+        """Consume many items at once and clear their cells, see _consume
+
+        Arguments:
+            indices {array of int} -- rows of the items in item_list
+        """
+        self.items.consume(indices)
+        self._reward[indices] = 0
+        for index in indices.tolist():
+            self._consumed |= 1 << index
+        self.item_index.discard_many(indices)
+        if not self._blocks_pending:
+            self._perm_contacts[indices + 1, 0] = 1
+        self._clear_cells(self.item_index.item_cells[indices])
+        if self.does_agent_exist:
+            rows = self._prox_index[indices]
+            self._prox_map[rows[rows >= 0], 0] = 0
+
+    def _unconsume(self, index):
+        """Undo _consume, putting an item back on the grid
+
+        Arguments:
+            index {int} -- row of the item in item_list
+        """
+        reward = self._layout_reward[index]
+        self.items.reward[index] = reward
+        self._reward[index] = reward
+        self.items.flags[index] ^= CONSUMED
+        self._consumed ^= 1 << index
+        self.item_index.restore(index)
+        if not self._blocks_pending:
+            self._perm_contacts[index + 1, 0] = 0
+        x_coord, y_coord = self.items.x[index], self.items.y[index]
+        self.representation[y_coord, x_coord] = reward
+        if self._vision_pad is not None:
+            self._vision_pad[y_coord + self._vision_padding[1],
+                             x_coord + self._vision_padding[0]] = reward
+        # rows on the target of the proximity map stay zeroed
+        row = self._prox_index[index]
+        if row >= 0 and self._prox_offsets[row].any():
+            self._prox_map[row, 0] = reward
+
+    def get_state(self):
+        """Snapshot the agent and the consumed items, for search
+
+        The snapshot is a small immutable GridState; the layout itself is
+        not copied, so a state can only be restored until the next
+        reset_layout or load_world.
+
+        Returns:
+            GridState -- state to give to set_state
+        """
+        if not self.does_agent_exist:
+            raise Exception("Agent does not exist!")
+        target = self._prox_pending
+        if target is None:
+            target = self._prox_target
+        return GridState(self.x_agent, self.y_agent, self.epoch,
+                         self._consumed, target, self._layout_serial)
+
+    def set_state(self, state):
+        """Restore a snapshot taken by get_state
+
+        Only the items consumed or restored since the snapshot are touched,
+        and the proximity map is shifted lazily as after a move.
+
+        Arguments:
+            state {GridState} -- state of this layout
+        """
+        if state.layout != self._layout_serial:
+            raise Exception("State was taken on another layout!")
+        changed = self._consumed ^ state.consumed
+        if changed:
+            # observers repaint the items that came back
+            self.layout_version += 1
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            index = bit.bit_length() - 1
+            if state.consumed & bit:
+                self._clear_cell(self.items.x[index], self.items.y[index])
+                self._consume(index)
+            else:
+                self._unconsume(index)
+        self.x_agent, self.y_agent = state.x_agent, state.y_agent
+        self.epoch = state.epoch
+        self._prox_pending = state.target
+
     def appropriate_move(self, xy_tuple, debugging=False):
         """Decide if a move is appropriate and take it if necessary
 
@@ -152,18 +556,18 @@ class Gridworld:
             self.x_agent = xEnd
             self.y_agent = yEnd
             output = self.representation[self.y_agent, self.x_agent]
-            # clear item
-            self.representation[self.y_agent, self.x_agent] = 0
+            self._clear_cell(self.x_agent, self.y_agent)
 
-            # remove item from proximity map
-            for row in self.item_list:
-                if (row[2] == self.x_agent and row[3] == self.y_agent):
-                    row[0] = 0
+            index = self._cell_item[self.y_agent * self.x_size +
+                                    self.x_agent]
+            if index >= 0:
+                self._consume(index)
             return output
         return self.collision_penalty
 
     def get_representation(self, showAgent=False, scaleEnvironment=False,
-                           cherry_color="FF0000", bomb_color="0000FF"):
+                           cherry_color="FF0000", bomb_color="0000FF",
+                           out=None, dtype=np.float64):
         """Return matrix form of total environment.
 
         Keyword Arguments:
@@ -171,39 +575,59 @@ class Gridworld:
                 scaled way to allow better visual representation
             showAgent {bool} -- whether to show the agent in the
                 matrix representation (default: {False})
+            out {matrix} -- ySize x xSize x 3 buffer to write the image into
+                instead of allocating a new one (default: {None})
+            dtype {type} -- np.float64 for colours in [0, 1], np.uint8 for
+                colours in [0, 255] (default: {np.float64})
 
         Returns:
             matrix -- matrix representing the environment
 
         """
+        palette = self._get_palette(cherry_color, bomb_color, dtype)
+        index = np.where(self.representation == 1, 1,
+                         np.where(self.representation == -1, 2, 0))
+        rgb_img = np.take(palette, index, axis=0, out=out)
 
-        def int_array_color(color_string):
-            return np.array([int(color_string[0:2], 16), int(
-                color_string[2:4], 16), int(color_string[4:], 16)])
+        if (showAgent):
+            rgb_img[self.y_agent, self.x_agent] = palette[3]
+        return rgb_img
 
-        def replace_color(object_at_location):
-            if object_at_location == 1:
-                return int_array_color(cherry_color) / 255
-            elif object_at_location == -1:
-                return int_array_color(bomb_color) / 255
-            else:
-                return np.array([0, 0, 0])
+    def _get_palette(self, cherry_color, bomb_color, dtype):
+        """Return the colours of empty cells, cherries, bombs and the agent
 
-        rgb_img = np.zeros(
-            (self.y_size, self.x_size, 3))
+        Colours are parsed once per world and cached.
 
-        for width in range(self.x_size):
-            for height in range(self.y_size):
-                rgb_img[height][width] = replace_color(
-                    self.representation[height][width])
+        Arguments:
+            cherry_color {string} -- hex colour of cherries
+            bomb_color {string} -- hex colour of bombs
+            dtype {type} -- np.float64 or np.uint8, see get_representation
 
-        if (showAgent):
-            rgb_img[self.y_agent, self.x_agent] = [1, 1, 1]
-        return rgb_img
+        Returns:
+            matrix -- 4 x 3 palette
+        """
+        key = (cherry_color, bomb_color, np.dtype(dtype))
+        palette = self._palettes.get(key)
+        if palette is None:
+            def int_array_color(color_string):
+                return [int(color_string[0:2], 16), int(
+                    color_string[2:4], 16), int(color_string[4:], 16)]
+
+            palette = np.array([[0, 0, 0], int_array_color(cherry_color),
+                                int_array_color(bomb_color), [255, 255, 255]])
+            if key[2] == np.uint8:
+                palette = palette.astype(np.uint8)
+            else:
+                palette = (palette / 255).astype(dtype)
+            self._palettes[key] = palette
+        return palette
 
     def return_vision(self, x_dist, y_dist):
         """Return what an agent "would" be able to see
 
+        The window is a zero-copy, read-only slice of a -inf padded copy of
+        the representation, which is kept up to date as items are consumed.
+
         Arguments:
             xDist {int} -- distance the agent can see in the x direction
             yDist {int} -- distance the agent can see in the y direction
@@ -214,23 +638,31 @@ class Gridworld:
         """
 
         if (self.does_agent_exist):
-            output = np.zeros((2 * y_dist + 1, 2 * x_dist + 1))
-
-            for x_coord in range(-x_dist, x_dist + 1):
-                for y_coord in range(-y_dist, y_dist + 1):
-                    x_pos = self.x_agent + x_coord
-                    y_pos = self.y_agent + y_coord
-
-                    if (x_pos < 0 or x_pos >= self.x_size) or (
-                            y_pos < 0 or y_pos >= self.y_size):
-                        output[y_coord + y_dist, x_coord + x_dist] = -np.infty
-                    else:
-                        output[y_coord + y_dist, x_coord +
-                               x_dist] = self.representation[y_pos, x_pos]
+            padded = self._get_vision_pad(x_dist, y_dist)
+            x_start = self.x_agent + self._vision_padding[0] - x_dist
+            y_start = self.y_agent + self._vision_padding[1] - y_dist
+            output = padded[y_start:y_start + 2 * y_dist + 1,
+                            x_start:x_start + 2 * x_dist + 1]
+            output.flags.writeable = False
             return output
         else:
             return False
 
+    def _get_vision_pad(self, x_dist, y_dist):
+        """Return the padded representation, growing it to fit the distances
+
+        Arguments:
+            x_dist {int} -- distance the agent can see in the x direction
+            y_dist {int} -- distance the agent can see in the y direction
+
+        Returns:
+            matrix -- representation padded with -inf by _vision_padding
+        """
+        self._vision_pad, self._vision_padding = vision.ensure_padding(
+            self._vision_pad, self._vision_padding, self.representation,
+            x_dist, y_dist)
+        return self._vision_pad
+
     def simulate_action(self, xy_tuple):
         """Return simulated matrix if a specific move was made
 
@@ -241,7 +673,7 @@ class Gridworld:
             matrix -- matrix representation of environment
         """
 
-        output = np.array(self.get_representation(True, True))
+        output = self.get_representation(True, True)
         if (self.move_possible(xy_tuple)):
             output[self.y_agent, self.x_agent] = 0
             output[self.y_agent + xy_tuple[1], self.x_agent + xy_tuple[0]] = 1
@@ -249,9 +681,121 @@ class Gridworld:
         else:
             return output
 
+    def simulate_all_actions(self):
+        """One-step lookahead for every action of ACTION_EFFECTS at once
+
+        Nothing is moved or consumed, and only the returned arrays are
+        allocated.
+
+        Returns:
+            matrix, array, array -- A x P x 3 proximity maps the agent would
+            observe after each action (see update_proximity_map), the A
+            rewards and whether each of the A moves collides
+        """
+        if not self.does_agent_exist:
+            raise Exception("Agent does not exist!")
+        x_end = self.x_agent + self._effects[:, 0]
+        y_end = self.y_agent + self._effects[:, 1]
+        x_clip = np.clip(x_end, 0, self.x_size - 1)
+        y_clip = np.clip(y_end, 0, self.y_size - 1)
+        collided = ((x_end != x_clip) | (y_end != y_clip) |
+                    (self.blocks[y_clip, x_clip] == 1))
+        rewards = np.where(collided, self.collision_penalty,
+                           self.representation[y_clip, x_clip])
+
+        # the proximity map follows the clipped target, even on collisions
+        dx = self.items.x[self._prox_rows] - x_clip[:, None]
+        dy = self.items.y[self._prox_rows] - y_clip[:, None]
+        observations = np.empty(dx.shape + (3,))
+        observations[:, :, 0] = self._reward[self._prox_rows]
+        np.divide(dx, float(self.x_size - 1), out=observations[:, :, 1])
+        np.divide(dy, float(self.y_size - 1), out=observations[:, :, 2])
+        observations[:, :, 0][(dx == 0) & (dy == 0)] = 0
+        return observations, rewards, collided
+
+    def _build_proximity_map(self):
+        """Compute the proximity map from scratch and remember the state
+        needed to update it incrementally.
+
+        Only passable items are part of the map; _prox_offsets holds their
+        integer distance to the last target and _prox_hits the rows zeroed
+        because they lie on that target.
+        """
+        rows = np.flatnonzero(self.items.passable)
+        index = np.full(len(self.items), -1)
+        index[rows] = np.arange(len(rows))
+        self._prox_target = (self.x_agent, self.y_agent)
+        store_array(self, "_prox_rows", rows)
+        store_array(self, "_prox_index", index)
+        store_array(self, "_prox_offsets", np.stack(
+            (self.items.x[rows], self.items.y[rows]), axis=1).astype(
+                np.int64) - self._prox_target)
+        self._prox_hits = np.flatnonzero(
+            ~self._prox_offsets.any(axis=1))
+        if self.kernels is not None:
+            store_array(self, "_prox_hit_buffer",
+                        np.zeros(len(rows), np.int64))
+        self._prox_pending = None
+        store_array(self, "_prox_map", self.calculate_prox_map((0, 0)))
+
+    @property
+    def prox_map(self):
+        """Proximity map of the last target, see calculate_prox_map
+
+        Moves only record their target; the map is brought up to date here,
+        when it is read.
+        """
+        if self._prox_pending is not None:
+            if self.profiler is None:
+                self._sync_proximity_map()
+            else:
+                start = perf_counter_ns()
+                self._sync_proximity_map()
+                self.profiler.add("prox_map", start)
+        return self._prox_map
+
+    def _sync_proximity_map(self):
+        """Shift the stored proximity map to the pending target
+        """
+        target = self._prox_pending
+        self._prox_pending = None
+        shift = (target[0] - self._prox_target[0],
+                 target[1] - self._prox_target[1])
+        if shift == (0, 0):
+            return
+        self._prox_target = target
+        if self.kernels is not None:
+            count = self.kernels.shift_proximity_map(
+                self._prox_map, self._prox_offsets, self._prox_rows,
+                self._reward, shift[0], shift[1],
+                float(self.x_size - 1), float(self.y_size - 1),
+                self._prox_hit_buffer)
+            self._prox_hits = self._prox_hit_buffer[:count]
+        else:
+            self._prox_offsets -= shift
+            self._prox_hits = self._shift_proximity_map(
+                self._prox_map, self._prox_offsets)
+
+    def _clipped_target(self, xy_tuple):
+        """Return where the agent would end up for a move, clipped to the grid
+
+        Arguments:
+            xy_tuple {Tuple} -- change in x and y position
+
+        Returns:
+            (int, int) -- clipped target coordinates
+        """
+        return (min(max(self.x_agent + xy_tuple[0], 0), self.x_size - 1),
+                min(max(self.y_agent + xy_tuple[1], 0), self.y_size - 1))
+
     def update_proximity_map(self, xy_tuple, speculative=False):
         """Update proximity map
 
+        The map is kept as a persistent array: moving the target shifts the
+        stored distances by a constant offset, and only the rows lying on the
+        old or new target get their reward rewritten. The shift itself is
+        deferred until prox_map is read.
+
         Arguments:
             xy_tuple {Tuple} -- change in x and y position
 
@@ -261,13 +805,46 @@ class Gridworld:
                 (default: {False})
 
         Returns:
-            matrix -- matrix of the map (only if speculative True)
+            matrix -- matrix of the map (only if speculative True). When the
+                target does not change this is a read-only view of prox_map
         """
 
-        if speculative:
-            return self.calculate_prox_map(xy_tuple)
-        else:
-            self.prox_map = self.calculate_prox_map(xy_tuple)
+        target = self._clipped_target(xy_tuple)
+        if not speculative:
+            self._prox_pending = target
+            return
+
+        current = self.prox_map
+        shift = (target[0] - self._prox_target[0],
+                 target[1] - self._prox_target[1])
+        if shift == (0, 0):
+            view = current.view()
+            view.flags.writeable = False
+            return view
+        prox_map = current.copy()
+        self._shift_proximity_map(prox_map, self._prox_offsets - shift)
+        return prox_map
+
+    def _shift_proximity_map(self, prox_map, offsets):
+        """Rewrite a proximity map for new distances to the target
+
+        Arguments:
+            prox_map {matrix} -- map to rewrite in place, currently matching
+                _prox_offsets
+            offsets {matrix} -- new integer x / y distances to the target
+
+        Returns:
+            array -- rows of the map lying on the new target
+        """
+        np.divide(offsets[:, 0], float(self.x_size - 1), out=prox_map[:, 1])
+        np.divide(offsets[:, 1], float(self.y_size - 1), out=prox_map[:, 2])
+
+        # restore the rows hit by the old target, then zero the new hits
+        prox_map[self._prox_hits, 0] = self._reward[
+            self._prox_rows[self._prox_hits]]
+        hits = np.flatnonzero(~offsets.any(axis=1))
+        prox_map[hits, 0] = 0
+        return hits
 
     def calculate_prox_map(self, xy_tuple):
         """Calculate the proximity map
@@ -276,81 +853,71 @@ class Gridworld:
             matrix -- format of [Reward, x distance, y distance]
         """
 
-        prox_map = np.array([row[[0, 2, 3]]
-                             for row in self.item_list if row[1]],
-                            dtype=np.float, copy=True)
-        # np.reshape(prox_map, (-1, 3))
-        prox_map[:, 1] -= (np.clip(self.x_agent +
-                                   xy_tuple[0], 0, self.x_size - 1))
-        prox_map[:, 2] -= (np.clip(self.y_agent +
-                                   xy_tuple[1], 0, self.y_size - 1))
+        prox_map = self.distance_to_objects(*self._clipped_target(xy_tuple))
 
         # scaling
         prox_map[:, 1] = prox_map[:, 1] / float(self.x_size - 1)
         prox_map[:, 2] = prox_map[:, 2] / float(self.y_size - 1)
 
         # make hit items worth 0
-        for row in prox_map:
-            if row[1] == 0 and row[2] == 0:
-                row[0] = 0
+        prox_map[(prox_map[:, 1] == 0) & (prox_map[:, 2] == 0), 0] = 0
 
         return prox_map
 
-    def calculate_grid_map(self, xy_tuple=(0,0)):
+    def calculate_grid_map(self, xy_tuple=(0, 0)):
         """Creates two matrices that show the distances between the agent and
-        the objects in the x / y dimensions
+        the objects in the x / y dimensions, plus the contact matrix
+
+        The object-to-object part is cached; only the agent row and column
+        are computed per call.
+
+        Arguments:
+            xy_tuple {tuple} -- (deltaX, deltaY)
+
+        Returns:
+            matrix -- n x n x 3 where n = # of objects + 1, the first column
+            is the agent (see README)
+        """
+        x_target, y_target = self._clipped_target(xy_tuple)
+        return distance.grid_maps(x_target, y_target, self.items.x,
+                                  self.items.y, *self.object_blocks())
+
+    def object_blocks(self):
+        """Return the cached object-to-object part of the grid map
+
+        It is built on the first call after a new layout, so worlds that
+        are never observed as a grid don't pay for the (K + 1) x (K + 1)
+        matrices.
+
+        Returns:
+            matrix, matrix, matrix -- x map, y map and permanent contacts,
+            see distance.object_blocks
+        """
+        if self._blocks_pending:
+            self._blocks_pending = False
+            for name, value in zip(
+                    ("_grid_x", "_grid_y", "_perm_contacts"),
+                    distance.object_blocks(self.items.x, self.items.y)):
+                store_array(self, name, value)
+            # consumed objects are always considered contacting
+            self._perm_contacts[1:, 0] = (self.items.flags & CONSUMED) != 0
+        return self._grid_x, self._grid_y, self._perm_contacts
+
+    @property
+    def perm_contacts(self):
+        """Permanent contacts of the grid map, see object_blocks"""
+        return self.object_blocks()[2]
+
+    def calculate_distance_matrix(self, xy_tuple=(0, 0)):
+        """Return the distance + contact observation of the README
 
         Arguments:
             xy_tuple {tuple} -- (deltaX, deltaY)
 
         Returns:
-            matrix, matrix -- two n x n matrices where n = # of objects, the
-            first column is the agent
-        """
-        # we are going to set the first col to be the agent
-        out_map_x = np.zeros(
-            (len(self.item_list) + 1, len(self.item_list) + 1))
-        out_map_y = np.zeros(
-            (len(self.item_list) + 1, len(self.item_list) + 1))
-        
-        if self.perm_contacts is None:
-            self.perm_contacts = np.zeros(
-                len(self.item_list) + 1, len(self.item_list) + 1)
-
-        contacts = self.perm_contacts
-
-        new_agent_x = np.clip(self.x_agent + xy_tuple[0], 0, self.x_size - 1)
-        new_agent_y = np.clip(self.y_agent + xy_tuple[1], 0, self.y_size - 1)
-
-        out_map_x[0][0] = new_agent_x
-        out_map_y[0][0] = new_agent_y
-
-        # assign the values on the diagnols
-        for index in range(1, len(self.item_list) + 1):
-            out_map_x[index][index] = self.item_list[index - 1][2]
-            out_map_y[index][index] = self.item_list[index - 1][3]
-
-        # we will first compute distances from the agent
-        for target in range(len(self.item_list)):
-            out_map_x[target + 1][0] = new_agent_x - self.item_list[target][2]
-            out_map_y[target + 1][0] = new_agent_y - self.item_list[target][3]
-            if abs(out_map_x[target + 1][0]) + abs(out_map_y[target + 1][0]) <= 1:
-                contacts[target + 1][0] = 1
-
-        # now, we will compute distances from objects to each other
-        for source in range(1, len((self.item_list)) + 1):
-            for target in range(source + 1, len(self.item_list) + 1):
-                distance = self.item_list[source - 1][2:] - \
-                    self.item_list[target - 1][2:]
-                out_map_x[target][source] = distance[0]
-                out_map_x[target][source] = distance[1]
-                if abs(distance[0]) + abs(distance[1]) == 1:
-                    contacts[target][source] = 1
-                elif abs(distance[0]) + abs(distance[1]) == 0:
-                    contacts[target][source] = 1
-                    self.perm_contacts[target][source] = 1 
-
-        return np.dstack((out_map_x, out_map_y, contacts))
+            matrix -- n x n x 3, see calculate_grid_map
+        """
+        return self.calculate_grid_map(xy_tuple)
 
     def calculate_contact_map(self, xy_tuple=(0, 0)):
         """
@@ -364,22 +931,37 @@ class Gridworld:
             list -- whether the agent is contacting with an object (1) or not (0)
         """
         deltaX, deltaY = self.calculate_grid_map(xy_tuple)
-        contact_map = np.zeros(len(self.item_list) + 1)
+        contact_map = np.zeros(len(self.items) + 1)
 
-        for item in range(1, len(self.item_list) + 1):
+        for item in range(1, len(self.items) + 1):
             if abs(deltaX[item][0]) + abs(deltaY[item][0]) <= 1:
                 contact_map[item] = 1
 
         return contact_map
 
-    def load_world(self, directory):
-        """Load world from directory
+    def save_world(self, path):
+        """Save the objects and collision penalty of the world to a .npz file
 
         Arguments:
-            directory {string} -- string of directory,
-            including the name of the pickle file
+            path {string} -- file to write, see storage.save_items
         """
+        storage.save_items(path, self.items, (self.x_size, self.y_size),
+                           self.collision_penalty, self._layout_reward)
 
-        parameters = p.load(open(directory, 'rb'))
-        self.item_list = parameters[0]
-        self.collision_penalty = parameters[1]
+    def load_world(self, path):
+        """Load a world saved by save_world
+
+        Everything derived from the objects (representation, blocks, the
+        cached grid map, the proximity map and compiled tables) is rebuilt.
+        Files are read with numpy only; pickles are not accepted.
+
+        Arguments:
+            path {string} -- file written by save_world
+        """
+        items, world_size, collision_penalty, rewards = \
+            storage.load_items(path)
+        if world_size != (self.x_size, self.y_size):
+            raise Exception(f"World of size {world_size} does not fit a "
+                            f"{(self.x_size, self.y_size)} Gridworld!")
+        self.collision_penalty = collision_penalty
+        self._build_layout(items, rewards)
@@ -1,10 +1,11 @@
-import sys
-
-import cv2
 import gym
 import numpy as np
 
+from time import perf_counter_ns
+
 from .gridworld import Gridworld
+from .layouts import LayoutQueue
+from .observations import RGBObserver, make_observer
 from gym import spaces
 
 # from gym import error, spaces, utils
@@ -12,7 +13,7 @@ from gym import spaces
 
 
 class KangGrid(gym.Env):
-    metadata = {'render.modes': ['human']}
+    metadata = {'render.modes': ['human', 'rgb_array']}
     _ACTION_BANK = ["UP", "LEFT", "DOWN", "RIGHT"]
     _ACTION_DEF = [[0, -1],
                    [-1, 0],
@@ -30,72 +31,164 @@ class KangGrid(gym.Env):
         """
         return self.env._get_objects()
 
-    def _set_render_time(self, time):
-        self._RENDER_TIME = time
+    def _get_agent_coords(self):
+        """Wrapper for _get_agent_coords method of the gridworld
 
-    def _randomly_create_objects(self, number_of_objects, xyDimension,
-                                 reward=None, reward_map=None):
-        """Creates random objects matching 'parameters' format
+        Returns:
+            (int, int) -- coordinates of agent
+        """
+        return self.env._get_agent_coords()
 
-        Arguments:
-            number_of_objects {int} -- number of objects to be generated
-            reward {int} -- reward of individual object
-            xyDimension {tuple} -- dimension of world
+    def _get_epoch(self):
+        """Wrapper for _get_epoch method of the gridworld
 
-        Keyword Arguments:
-            reward_map {array of int} -- list of rewards to use (default: {""})
+        Returns:
+            int -- epoch of the world
+        """
+        return self.env._get_epoch()
+
+    def get_state(self):
+        """Wrapper for get_state method of the gridworld
 
         Returns:
-            list -- list of objects
+            GridState -- immutable snapshot of the current layout, valid
+            until the next reset
+        """
+        return self.env.get_state()
+
+    def set_state(self, state):
+        """Wrapper for set_state method of the gridworld
+
+        Wrappers keep their own state; the step count of gym.make's
+        TimeLimit, in particular, is not rolled back.
+
+        Arguments:
+            state {GridState} -- state returned by get_state
+        """
+        self.env.set_state(state)
+
+    def _set_render_time(self, time):
+        self._RENDER_TIME = time
+
+    def set_telemetry(self, hook):
+        """Install a per-step telemetry hook, or remove it with None
+
+        The hook is called after every step as
+        hook(epoch, action, position, reward, done, collided); see
+        telemetry.StepRecorder for a ready-made ring buffer. If the hook has
+        an end_episode method, reset calls it first, so episodes ended by a
+        wrapper (like the TimeLimit of gym.make) rather than by a done step
+        are seen too. Nothing is computed for telemetry while no hook is
+        installed.
+
+        Arguments:
+            hook {callable} -- telemetry hook, or None to disable telemetry
         """
-        xSize = xyDimension[0]
-        ySize = xyDimension[1]
+        self.telemetry = hook
 
-        coordinates = np.random.choice(
-            xSize * ySize - 1, number_of_objects, replace=False) + 1
+    def set_profiler(self, timer):
+        """Install a profiling.PhaseTimer, or remove it with None
 
-        output = []
+        The timer is shared with the Gridworld, and accumulates the time
+        spent in every phase of step and reset. Nothing is timed while no
+        timer is installed.
 
-        if reward_map:
-            for i in range(number_of_objects):
-                toAdd = [reward_map[i], True, int(coordinates[i] %
-                                                  xSize), int(coordinates[i] // xSize)]
-                output.append(toAdd)
-        else:
-            for i in range(number_of_objects):
-                toAdd = [reward, True, int(coordinates[i] %
-                                           xSize), int(coordinates[i] // xSize)]
-                output.append(toAdd)
+        Arguments:
+            timer {PhaseTimer} -- timer, or None to disable profiling
+        """
+        self.profiler = timer
+        self.env.profiler = timer
+
+    def stats(self):
+        """Per-phase timings of the installed profiler
 
-        return output
+        Returns:
+            dict -- see PhaseTimer.stats, empty if profiling is disabled
+        """
+        if self.profiler is None:
+            return {}
+        return self.profiler.stats()
 
     def _create_env(self):
         """Creates an environment and places agent at (0, 0)
-        Creates exactly one bomb and cherry somerwhere on the map, as long 
-        as they aren't at the origin or on top of each other
+        Places the objects of reward_map somewhere on the map, as long as
+        they aren't at the origin or on top of each other
 
         Returns:
-            Gridworld -- 5x5 gridworld with a cherry and bomb placed randomly
+            Gridworld -- gridworld with the objects placed randomly
         """
-        params = [self._randomly_create_objects(
-            2, (5, 5), reward_map=[1, -1]), 0]
-        grid = Gridworld((5, 5), self._ACTION_INFO, params)
+        params = [self._layouts.pop(), self.collision_penalty]
+        grid = Gridworld(self.world_size, self._ACTION_INFO, params,
+                         compiled=self.compiled, backend=self.backend)
         grid.place_agent(0, 0)
         return grid
 
-    def __init__(self):
-        """Create the env. Uses an internal variable to store the environment
+    def seed(self, seed=None):
+        """Seed the env's random number generator
+
+        Layouts already sampled from the previous generator are discarded.
+
+        Keyword Arguments:
+            seed {int} -- seed, or None for fresh entropy (default: {None})
+
+        Returns:
+            list -- the seed used
         """
-        self.env = self._create_env()
-        self.env.place_agent(0, 0)
+        self.np_random = np.random.default_rng(seed)
+        self._layouts = LayoutQueue(self.np_random, self.world_size,
+                                    self.reward_map)
+        return [seed]
+
+    def __init__(self, seed=None, world_size=(5, 5), reward_map=(1, -1),
+                 number_of_objects=None, collision_penalty=0,
+                 observation="grid", vision_distance=(2, 2), copy=True,
+                 compiled=False, backend="numpy"):
+        """Create the env. Uses an internal variable to store the environment
 
-        # self.observation_space = spaces.Tuple(
-        #     (spaces.Box(low=0, high=4, shape=(5, 5)),
-        #      spaces.Box(low=0, high=1, shape=(5, 5))))
+        All keyword arguments can also be given to
+        gym.make('kang-grid-v0', ...).
 
-        # FLAG - the observation space depends on what we return (see step)
+        Keyword Arguments:
+            seed {int} -- seed of the layout generator (default: {None})
+            world_size {tuple} -- (xSize, ySize) of the world
+                (default: {(5, 5)})
+            reward_map {array of int} -- reward of each object
+                (default: {(1, -1)})
+            number_of_objects {int} -- objects per world; reward_map is
+                repeated to this length (default: {len(reward_map)})
+            collision_penalty {int} -- reward for an impossible move
+                (default: {0})
+            observation {string} -- encoding of the observations: "grid"
+                (the README's distance + contact tensor), "prox", "vision"
+                or "rgb"; see observations.make_observer (default: {"grid"})
+            vision_distance {tuple} -- (x, y) distance seen by the "vision"
+                encoding (default: {(2, 2)})
+            copy {bool} -- return copies of the observation buffer rather
+                than the buffer that the next step overwrites
+                (default: {True})
+            compiled {bool} -- precompute the dynamics of every layout into
+                transition tables; see Gridworld (default: {False})
+            backend {string} -- "numpy", or "numba" for compiled step
+                kernels when numba is installed; see Gridworld
+                (default: {"numpy"})
+        """
+        if number_of_objects is None:
+            number_of_objects = len(reward_map)
+        self.world_size = tuple(world_size)
+        self.reward_map = np.resize(reward_map, number_of_objects)
+        self.collision_penalty = collision_penalty
+        self.compiled = compiled
+        self.backend = backend
+        self.seed(seed)
+        self.env = self._create_env()
+        self.telemetry = None
+        self.profiler = None
 
-        self.observation_space = spaces.Box(low=0, high=4, shape=(3, 3, 2))
+        self.copy = copy
+        self._observer = make_observer(observation, self.world_size,
+                                       self.reward_map, vision_distance)
+        self.observation_space = self._observer.space
+        self._frames = None
 
         self.action_space = spaces.Discrete(4)
 
@@ -110,8 +203,18 @@ class KangGrid(gym.Env):
         """
 
         done = False
+        timer = self.profiler
+        if timer is not None:
+            step_start = perf_counter_ns()
+
+        if self.telemetry is not None:
+            start = self.env._get_agent_coords()
 
+        if timer is not None:
+            move_start = perf_counter_ns()
         reward = self.env.move_agent(action)
+        if timer is not None:
+            timer.add("move_agent", move_start)
 
         # 50 needs to be dependent on _max_episode_steps in __init__.py
 
@@ -123,33 +226,76 @@ class KangGrid(gym.Env):
 
         # FLAG - the state affects the observation state
 
-        state = self.env.calculate_distance_matrix((0, 0))
-
-        print(
-            f"Action {self._ACTION_BANK[action]} | Epoch : {self.env._get_epoch()}")
-
-        print(
-            f"Pos: {self.env._get_agent_coords()} | Reward : {reward} ")
-
-        print()
-
+        if timer is not None:
+            phase_start = perf_counter_ns()
+        state = self._observe()
+        if timer is not None:
+            timer.add("observation", phase_start)
+
+        if self.telemetry is not None:
+            if timer is not None:
+                phase_start = perf_counter_ns()
+            position = self.env._get_agent_coords()
+            self.telemetry(self.env._get_epoch(), action, position, reward,
+                           done, position == start)
+            if timer is not None:
+                timer.add("telemetry", phase_start)
+
+        if timer is not None:
+            timer.add("step", step_start)
         return state, reward, done, {}
 
-    def reset(self):
+    def reset(self, seed=None):
         """Resets environment and re-initializes agent at (0, 0)
+
+        The next pre-sampled layout is loaded into the existing Gridworld.
+
+        Keyword Arguments:
+            seed {int} -- reseed the env before resetting (default: {None})
         """
-        self.env = self._create_env()
+        timer = self.profiler
+        if timer is not None:
+            start = perf_counter_ns()
+        if seed is not None:
+            self.seed(seed)
+        if self.telemetry is not None:
+            end_episode = getattr(self.telemetry, "end_episode", None)
+            if end_episode is not None:
+                end_episode()
+        self.env.reset_layout(self._layouts.pop())
         self.env.place_agent(0, 0)
-        return self.env.calculate_distance_matrix((0, 0))
+        state = self._observe()
+        if timer is not None:
+            timer.add("reset", start)
+        return state
+
+    def _observe(self):
+        """Return the observation of the current state
+        """
+        state = self._observer.observe(self.env)
+        return state.copy() if self.copy else state
 
     def render(self, mode='human', close=False):
         """Renders an image of the environment currently
 
         Keyword Arguments:
-            mode {str} -- #FLAG ? unknown (default: {'human'})
+            mode {str} -- 'human' shows the image in a window for
+                _RENDER_TIME milliseconds; 'rgb_array' returns it without
+                any GUI (default: {'human'})
             close {bool} -- #FLAG ? unknown (default: {False})
-            time {int} -- time to display, in milliseconds
+
+        Returns:
+            matrix -- ySize x xSize x 3 uint8 image in 'rgb_array' mode
         """
+        if mode == 'rgb_array':
+            # the frame is repainted incrementally, see RGBObserver
+            if self._frames is None:
+                self._frames = RGBObserver(self.world_size)
+            return self._frames.observe(self.env).copy()
+
+        # OpenCV is slow to import and only needed here
+        import cv2
+
         cv2.imshow('image', cv2.resize(self.env.get_representation(showAgent=True), (200, 200),
                                        interpolation=cv2.INTER_NEAREST))
         cv2.waitKey(self._RENDER_TIME)
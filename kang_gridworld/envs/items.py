@@ -0,0 +1,153 @@
+import numpy as np
+
+# bits of ItemStore.flags
+PASSABLE = 1
+CONSUMED = 2
+
+
+class ItemStore:
+    """Typed, columnar storage for the items of one or many worlds
+
+    Each item takes 9 bytes: a float32 reward, int16 x and y coordinates
+    (so worlds are limited to 32767 cells a side) and a uint8 bitfield of
+    PASSABLE / CONSUMED flags. The columns can have any shape; a single
+    world uses (K,) and a batch of worlds (N, K), which keeps a million
+    resident two-item worlds in about 18 MB.
+
+    Consuming an item sets its CONSUMED flag and zeroes its reward, like the
+    old item_list rows did. The float32 reward is only storage: Gridworld
+    and KangGridVec return rewards and observations from float64 copies of
+    the rewards they were given.
+    """
+    __slots__ = ("reward", "x", "y", "flags")
+
+    def __init__(self, shape):
+        """Create a store of empty, impassable items
+
+        Arguments:
+            shape {int or tuple} -- shape of every column
+        """
+        self.reward = np.zeros(shape, dtype=np.float32)
+        self.x = np.zeros(shape, dtype=np.int16)
+        self.y = np.zeros(shape, dtype=np.int16)
+        self.flags = np.zeros(shape, dtype=np.uint8)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Create a store from rows of [reward, passable, xCoord, yCoord]
+
+        Arguments:
+            rows {matrix} -- (..., 4) rows, or an ItemStore to copy
+
+        Returns:
+            ItemStore -- new store
+        """
+        if isinstance(rows, ItemStore):
+            shape = rows.shape
+        else:
+            rows = np.asarray(rows)
+            if rows.ndim < 2:
+                rows = rows.reshape(-1, 4)
+            shape = rows.shape[:-1]
+        store = cls(shape)
+        store.assign(rows)
+        return store
+
+    @classmethod
+    def from_layouts(cls, coordinates, reward_map):
+        """Create a store of passable items from sampled layouts
+
+        Arguments:
+            coordinates {matrix} -- (..., K, 2) (x, y) of every item, see
+                layouts.sample_layouts
+            reward_map {array of int} -- (K,) reward of each item
+
+        Returns:
+            ItemStore -- new store
+        """
+        coordinates = np.asarray(coordinates)
+        store = cls(coordinates.shape[:-1])
+        store.reward[...] = reward_map
+        store.flags[...] = PASSABLE
+        store.x[...] = coordinates[..., 0]
+        store.y[...] = coordinates[..., 1]
+        return store
+
+    def assign(self, rows):
+        """Overwrite the items in place
+
+        Arguments:
+            rows {matrix} -- rows of [reward, passable, xCoord, yCoord]
+                matching the shape of the store, or another ItemStore
+        """
+        if isinstance(rows, ItemStore):
+            for name in self.__slots__:
+                getattr(self, name)[...] = getattr(rows, name)
+            return
+        rows = np.asarray(rows).reshape(self.shape + (4,))
+        self.reward[...] = rows[..., 0]
+        self.flags[...] = np.where(rows[..., 1] != 0, PASSABLE, 0)
+        self.x[...] = rows[..., 2]
+        self.y[...] = rows[..., 3]
+
+    @property
+    def shape(self):
+        return self.x.shape
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    @property
+    def passable(self):
+        """bool array -- whether the agent can walk onto each item"""
+        return (self.flags & PASSABLE) != 0
+
+    @property
+    def consumed(self):
+        """bool array -- whether each item has been consumed"""
+        return (self.flags & CONSUMED) != 0
+
+    def consume(self, index):
+        """Mark an item as consumed
+
+        Arguments:
+            index {int or tuple} -- position of the item in the columns
+        """
+        self.reward[index] = 0
+        self.flags[index] |= CONSUMED
+
+    def as_matrix(self):
+        """Return the items as rows of [reward, passable, xCoord, yCoord]
+
+        Returns:
+            matrix -- (..., 4) float64 copy, the pre-ItemStore item_list
+            format
+        """
+        rows = np.empty(self.shape + (4,))
+        rows[..., 0] = self.reward
+        rows[..., 1] = self.passable
+        rows[..., 2] = self.x
+        rows[..., 3] = self.y
+        return rows
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, index):
+        """Select items or worlds; basic indexing returns views
+
+        Returns:
+            ItemStore -- store over the selected items
+        """
+        store = ItemStore.__new__(ItemStore)
+        for name in self.__slots__:
+            setattr(store, name, getattr(self, name)[index])
+        return store
+
+    def __array__(self, dtype=None):
+        rows = self.as_matrix()
+        return rows if dtype is None else rows.astype(dtype)
+
+    def __repr__(self):
+        return f"ItemStore(shape={self.shape})"
@@ -0,0 +1,100 @@
+import numba
+
+# compiled once and cached next to this file. error_model="numpy" makes
+# float division by zero give inf / nan like numpy does, instead of raising
+_jit = numba.njit(cache=True, error_model="numpy")
+
+
+@_jit
+def move_agent(x_agent, y_agent, x_move, y_move, collision_penalty, blocks,
+               representation, cell_item):
+    """The hot path of Gridworld.move_agent
+
+    Checks the move like move_possible, then moves the agent and clears its
+    cell like appropriate_move. Consuming the item on the cell, which is
+    rare, is left to Gridworld._consume.
+
+    Arguments:
+        x_agent, y_agent {int} -- agent coordinates
+        x_move, y_move {int} -- change in x and y position
+        collision_penalty {float} -- reward for an impossible move
+        blocks {matrix} -- Gridworld.blocks
+        representation {matrix} -- Gridworld.representation, updated in
+            place
+        cell_item {array of int} -- ItemIndex.cell_item
+
+    Returns:
+        int, int, int, int, float, int -- new agent x / y, clipped target
+        x / y of the proximity map, the reward and the item on the new cell
+        (-1 if none)
+    """
+    y_size, x_size = blocks.shape
+    x_end = x_agent + x_move
+    y_end = y_agent + y_move
+    x_target = min(max(x_end, 0), x_size - 1)
+    y_target = min(max(y_end, 0), y_size - 1)
+    if (x_end != x_target or y_end != y_target or
+            blocks[y_end, x_end] == 1):
+        return x_agent, y_agent, x_target, y_target, collision_penalty, -1
+
+    reward = representation[y_end, x_end]
+    representation[y_end, x_end] = 0
+    return (x_end, y_end, x_target, y_target, reward,
+            cell_item[y_end * x_size + x_end])
+
+
+@_jit
+def shift_proximity_map(prox_map, offsets, rows, item_reward, x_shift,
+                        y_shift, x_scale, y_scale, hits):
+    """Gridworld._sync_proximity_map for a non-zero shift
+
+    Arguments:
+        prox_map {matrix} -- Gridworld._prox_map, rewritten in place
+        offsets {matrix} -- Gridworld._prox_offsets, shifted in place
+        rows {array of int} -- Gridworld._prox_rows
+        item_reward {array} -- Gridworld._reward
+        x_shift, y_shift {int} -- move of the target
+        x_scale, y_scale {float} -- xSize - 1 and ySize - 1
+        hits {array of int} -- buffer for the rows on the new target
+
+    Returns:
+        int -- number of hits written
+    """
+    count = 0
+    for row in range(offsets.shape[0]):
+        offsets[row, 0] -= x_shift
+        offsets[row, 1] -= y_shift
+        prox_map[row, 1] = offsets[row, 0] / x_scale
+        prox_map[row, 2] = offsets[row, 1] / y_scale
+        # make hit items worth 0
+        if offsets[row, 0] == 0 and offsets[row, 1] == 0:
+            prox_map[row, 0] = 0
+            hits[count] = row
+            count += 1
+        else:
+            prox_map[row, 0] = item_reward[rows[row]]
+    return count
+
+
+@_jit
+def update_grid_observation(buffer, x_agent, y_agent, items_x, items_y,
+                            perm_contacts):
+    """observations.GridObserver._update
+
+    Arguments:
+        buffer {matrix} -- (K + 1, K + 1, 3) observation, updated in place
+        x_agent, y_agent {int} -- agent coordinates
+        items_x, items_y {array} -- ItemStore.x and ItemStore.y
+        perm_contacts {matrix} -- Gridworld.perm_contacts
+    """
+    buffer[0, 0, 0] = x_agent
+    buffer[0, 0, 1] = y_agent
+    for item in range(items_x.shape[0]):
+        delta_x = x_agent - items_x[item]
+        delta_y = y_agent - items_y[item]
+        buffer[item + 1, 0, 0] = delta_x
+        buffer[item + 1, 0, 1] = delta_y
+        contact = perm_contacts[item + 1, 0]
+        if abs(delta_x) + abs(delta_y) <= 1 and contact < 1:
+            contact = 1.0
+        buffer[item + 1, 0, 2] = contact
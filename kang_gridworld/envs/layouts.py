@@ -0,0 +1,115 @@
+import numpy as np
+
+
+def sample_layouts(rng, count, world_size, number_of_objects):
+    """Sample many random object placements at once
+
+    The objects of a layout land on distinct cells and never on the origin,
+    where the agent starts; every ordered placement is equally likely.
+
+    Arguments:
+        rng {np.random.Generator} -- source of randomness
+        count {int} -- number of layouts
+        world_size {tuple} -- (xSize, ySize) of the world
+        number_of_objects {int} -- objects per layout
+
+    Returns:
+        matrix -- (count, number_of_objects, 2) int array of (x, y)
+    """
+    x_size, y_size = world_size
+    free_cells = x_size * y_size - 1
+    if 4 * number_of_objects > free_cells:
+        # crowded worlds: take the smallest of one random key per cell
+        keys = rng.random((count, free_cells))
+        picked = np.argpartition(keys, number_of_objects - 1,
+                                 axis=1)[:, :number_of_objects]
+        # argpartition leaves the picked cells unordered; order them by key
+        order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1)
+        cells = np.take_along_axis(picked, order, axis=1) + 1
+    else:
+        # sparse worlds: draw cells independently, then redraw every object
+        # that shares its cell with an object of lower index. An object only
+        # ever leaves cells that end up holding lower objects, so its final
+        # cell is uniform over the cells they leave free. At most a quarter
+        # of the cells are taken, so the redraws stay
+        # O(count * number_of_objects)
+        cells = rng.integers(1, free_cells + 1,
+                             size=(count, number_of_objects))
+        rows = np.arange(count)
+        while len(rows):
+            layout = cells[rows]
+            # a stable sort keeps the lowest object of a cell first
+            order = np.argsort(layout, axis=1, kind="stable")
+            ordered = np.take_along_axis(layout, order, axis=1)
+            repeated = np.zeros(layout.shape, dtype=bool)
+            repeated[:, 1:] = ordered[:, 1:] == ordered[:, :-1]
+            clashes = np.empty_like(repeated)
+            np.put_along_axis(clashes, order, repeated, axis=1)
+            layout[clashes] = rng.integers(1, free_cells + 1,
+                                           size=int(clashes.sum()))
+            cells[rows] = layout
+            rows = rows[clashes.any(axis=1)]
+
+    layouts = np.empty((count, number_of_objects, 2), dtype=np.int64)
+    layouts[:, :, 0] = cells % x_size
+    layouts[:, :, 1] = cells // x_size
+    return layouts
+
+
+class LayoutQueue:
+    """Pre-sampled layouts, handed out one at a time
+
+    Layouts are drawn from sample_layouts in chunks, so the cost of
+    sampling is paid once per chunk rather than once per reset. By default
+    chunks start small and double up to the maximum size, so that
+    short-lived envs don't pay for thousands of layouts they never use.
+    """
+    _FIRST_CHUNK = 4
+
+    def __init__(self, rng, world_size, reward_map, chunk_size=None):
+        """Create an empty queue
+
+        Arguments:
+            rng {np.random.Generator} -- source of randomness
+            world_size {tuple} -- (xSize, ySize) of the world
+            reward_map {array of float} -- reward of each object
+
+        Keyword Arguments:
+            chunk_size {int} -- layouts sampled at a time (default: {from
+                4, doubling up to as many as fit in about 2^16 objects, at
+                most 4096})
+        """
+        self._first_chunk = chunk_size
+        if chunk_size is None:
+            chunk_size = max(1, min(4096, 2 ** 16 // len(reward_map)))
+            self._first_chunk = min(chunk_size, self._FIRST_CHUNK)
+        self.rng = rng
+        self.world_size = world_size
+        self.chunk_size = chunk_size
+        self.reward_map = reward_map
+        # only the sampled prefix of the buffer is ever written; float64 so
+        # that rewards keep every value they can have in Python
+        self._items = np.empty((chunk_size, len(reward_map), 4))
+        self._filled = 0
+        self._cursor = 0
+
+    def pop(self):
+        """Return the next layout
+
+        The returned rows are a view into the queue, valid until the queue
+        is refilled.
+
+        Returns:
+            matrix -- K x 4 items of form [reward, passable, xCoord, yCoord]
+        """
+        if self._cursor == self._filled:
+            self._filled = min(self.chunk_size,
+                               max(self._first_chunk, 2 * self._filled))
+            chunk = self._items[:self._filled]
+            chunk[:, :, 0] = self.reward_map
+            chunk[:, :, 1] = True
+            chunk[:, :, 2:] = sample_layouts(
+                self.rng, self._filled, self.world_size, chunk.shape[1])
+            self._cursor = 0
+        self._cursor += 1
+        return self._items[self._cursor - 1]
@@ -0,0 +1,220 @@
+import numpy as np
+
+from . import vision
+from .gridworld import Gridworld
+
+
+class MultiAgentGridworld:
+    """Many agents moving simultaneously in one shared Gridworld layout
+
+    The layout (representation, blocks, items and their index) is held by
+    an ordinary Gridworld, whose own agent is never placed. The agents are
+    arrays:
+
+        x_agent, y_agent {(M,) int} -- agent coordinates
+        x_target, y_target {(M,) int} -- clipped target of each agent's last
+            move, which its proximity map follows (see
+            Gridworld.update_proximity_map)
+        epoch {int} -- number of moves so far
+
+    move_agents applies every agent's action at once. A move is impossible
+    when it leaves the grid or enters an impassable object and, with
+    exclusive cells, when it enters a cell another agent keeps, swaps places
+    with another agent, or loses a contested cell. Contests are won by a
+    random priority drawn every move. An item is consumed by the first
+    agent (in the same priority) that enters its cell; other agents
+    entering it at the same time get 0.
+    """
+
+    def __init__(self, worldSize, action_specs, parameters, positions,
+                 exclusive=True, seed=None):
+        """Create the world and place the agents
+
+        Arguments:
+            worldSize {tuple} -- (xSize, ySize) of the world
+            action_specs {list} -- [ACTION_BANK, ACTION_EFFECTS], see
+                Gridworld
+            parameters {list} -- [objects, collision_penalty], see Gridworld
+            positions {matrix} -- (M, 2) x / y of every agent
+
+        Keyword Arguments:
+            exclusive {bool} -- at most one agent per cell (default: {True})
+            seed {int} -- seed of the contest priorities (default: {None})
+        """
+        self.world = Gridworld(worldSize, action_specs, parameters)
+        self.x_size = self.world.x_size
+        self.y_size = self.world.y_size
+        self.exclusive = exclusive
+        self.np_random = np.random.default_rng(seed)
+        self._effects = self.world._effects
+        # agent on each cell, y * xSize + x, with exclusive cells
+        self._occupant = np.full(self.x_size * self.y_size, -1)
+        self.place_agents(positions)
+
+    def reset_layout(self, objects, positions):
+        """Replace the objects of the world and place the agents again
+
+        Arguments:
+            objects {list or ItemStore} -- see Gridworld.item_list format
+            positions {matrix} -- (M, 2) x / y of every agent
+        """
+        self.world.reset_layout(objects)
+        self.place_agents(positions)
+
+    def place_agents(self, positions):
+        """Place every agent; agents on an item only consume it by moving
+        back onto its cell
+
+        Arguments:
+            positions {matrix} -- (M, 2) x / y of every agent
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        x_coords, y_coords = positions[:, 0], positions[:, 1]
+        if (np.any(x_coords < 0) or np.any(x_coords >= self.x_size) or
+                np.any(y_coords < 0) or np.any(y_coords >= self.y_size)):
+            raise Exception("Agent placed off the grid!")
+        if self.world.blocks[y_coords, x_coords].any():
+            raise Exception("Agent placed on an impassable object!")
+        cells = y_coords * self.x_size + x_coords
+        if self.exclusive and len(np.unique(cells)) < len(cells):
+            raise Exception("Agents placed on the same cell!")
+
+        self.number_of_agents = len(positions)
+        self.x_agent = x_coords.copy()
+        self.y_agent = y_coords.copy()
+        self.x_target = x_coords.copy()
+        self.y_target = y_coords.copy()
+        self.epoch = 0
+        self._agents = np.arange(self.number_of_agents)
+        self._occupant[...] = -1
+        if self.exclusive:
+            self._occupant[cells] = self._agents
+
+    def sample_free_cells(self, count):
+        """Draw distinct cells without objects or agents
+
+        Arguments:
+            count {int} -- number of cells
+
+        Returns:
+            matrix -- (count, 2) x / y of the cells
+        """
+        free = ((self.world.item_index.cell_item < 0) &
+                (self.world.blocks.ravel() != 1) & (self._occupant < 0))
+        cells = self.np_random.choice(np.flatnonzero(free), count,
+                                      replace=False)
+        return np.stack((cells % self.x_size, cells // self.x_size), axis=1)
+
+    def move_agents(self, actions):
+        """Move every agent at once
+
+        Arguments:
+            actions {array of int} -- (M,) index of each agent's action
+
+        Returns:
+            array, array -- (M,) rewards and (M,) whether each move was
+            impossible (and earned the collision penalty)
+        """
+        effects = self._effects[np.asarray(actions)]
+        x_end = self.x_agent + effects[:, 0]
+        y_end = self.y_agent + effects[:, 1]
+        x_clip = np.clip(x_end, 0, self.x_size - 1)
+        y_clip = np.clip(y_end, 0, self.y_size - 1)
+        self.x_target, self.y_target = x_clip, y_clip
+        self.epoch += 1
+
+        moving = ((x_end == x_clip) & (y_end == y_clip) &
+                  (self.world.blocks[y_clip, x_clip] != 1))
+        cells = self.y_agent * self.x_size + self.x_agent
+        targets = y_clip * self.x_size + x_clip
+        priority = self.np_random.permutation(self.number_of_agents)
+        if self.exclusive:
+            self._resolve_conflicts(moving, cells, targets, priority)
+
+        movers = self._agents[moving]
+        rewards = np.full(self.number_of_agents,
+                          float(self.world.collision_penalty))
+        rewards[movers] = 0
+        # the first mover of each cell takes what is on it
+        order = movers[np.lexsort((priority[movers], targets[movers]))]
+        ordered = targets[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = ordered[1:] != ordered[:-1]
+        winners, entered = order[first], ordered[first]
+        rewards[winners] = self.world.representation.ravel()[entered]
+        items = self.world.item_index.cell_item[entered]
+        self.world._consume_many(items[items >= 0])
+
+        if self.exclusive:
+            self._occupant[cells[movers]] = -1
+            self._occupant[targets[movers]] = movers
+        self.x_agent[movers] = x_clip[movers]
+        self.y_agent[movers] = y_clip[movers]
+        return rewards, ~moving
+
+    def _resolve_conflicts(self, moving, cells, targets, priority):
+        """Stop the moves that break exclusive cells, in place
+
+        Refusing a move can block the agents moving into the refused
+        agent's cell, so the checks are repeated until no more moves are
+        refused; every round only uses array operations.
+
+        Arguments:
+            moving {array of bool} -- (M,) possible moves, updated in place
+            cells {array of int} -- (M,) current cell of every agent
+            targets {array of int} -- (M,) target cell of every agent
+            priority {array of int} -- (M,) contest priority, lowest wins
+        """
+        while True:
+            movers = self._agents[moving]
+            # contested cells go to the mover with the lowest priority
+            order = movers[np.lexsort((priority[movers], targets[movers]))]
+            ordered = targets[order]
+            lost = order[1:][ordered[1:] == ordered[:-1]]
+
+            # the cell's agent keeps it, or moves onto the mover's cell
+            occupants = self._occupant[targets[movers]]
+            occupied = (occupants >= 0) & (occupants != movers)
+            occupants, entering = occupants[occupied], movers[occupied]
+            blocked = entering[~moving[occupants] |
+                               (targets[occupants] == cells[entering])]
+
+            if not len(lost) and not len(blocked):
+                return
+            moving[lost] = False
+            moving[blocked] = False
+
+    def prox_maps(self):
+        """Return the proximity map of every agent
+
+        Returns:
+            matrix -- (M, P, 3) of [Reward, x distance, y distance] for the
+            P passable items, see Gridworld.calculate_prox_map
+        """
+        passable = self.world.items.passable
+        dx = self.world.items.x[passable] - self.x_target[:, None]
+        dy = self.world.items.y[passable] - self.y_target[:, None]
+        prox_maps = np.empty(dx.shape + (3,))
+        prox_maps[..., 0] = self.world._reward[passable]
+        np.divide(dx, float(self.x_size - 1), out=prox_maps[..., 1])
+        np.divide(dy, float(self.y_size - 1), out=prox_maps[..., 2])
+
+        # make hit items worth 0
+        prox_maps[..., 0][(dx == 0) & (dy == 0)] = 0
+        return prox_maps
+
+    def return_vision(self, x_dist, y_dist):
+        """Return what every agent can see; other agents are not shown
+
+        Arguments:
+            x_dist {int} -- distance the agents can see in the x direction
+            y_dist {int} -- distance the agents can see in the y direction
+
+        Returns:
+            matrix -- (M, 2 * y_dist + 1, 2 * x_dist + 1) windows, see
+            Gridworld.return_vision
+        """
+        padded = self.world._get_vision_pad(x_dist, y_dist)
+        return vision.extract_windows(padded, self.world._vision_padding,
+                                      self.x_agent, self.y_agent, x_dist,
+                                      y_dist)
@@ -0,0 +1,166 @@
+import numpy as np
+
+from gym import spaces
+
+
+class Observer:
+    """Builds the observation of a Gridworld into a preallocated buffer
+
+    Subclasses rebuild their buffer when the layout of the world changes
+    (see Gridworld.layout_version) and otherwise only update the parts a
+    step can change. The buffer is returned as is and overwritten by the
+    next call to observe.
+    """
+
+    def __init__(self, space):
+        self.space = space
+        self.buffer = np.zeros(space.shape, dtype=space.dtype)
+        self._grid = None
+        self._version = None
+
+    def observe(self, grid):
+        """Bring the buffer up to date with a world
+
+        Arguments:
+            grid {Gridworld} -- world to observe, with its agent placed
+
+        Returns:
+            matrix -- the buffer
+        """
+        if grid is not self._grid or grid.layout_version != self._version:
+            self._grid = grid
+            self._version = grid.layout_version
+            self._rebuild(grid)
+        self._update(grid)
+        return self.buffer
+
+    def _rebuild(self, grid):
+        """Refill the layout dependent parts of the buffer"""
+
+    def _update(self, grid):
+        """Refill the parts of the buffer a step can change"""
+        raise NotImplementedError
+
+
+class GridObserver(Observer):
+    """The README's n x n x 3 distance + contact tensor, see
+    Gridworld.calculate_grid_map
+
+    The object-to-object part is copied in once per layout; a step only
+    rewrites the agent row and column.
+    """
+
+    def __init__(self, world_size, number_of_objects):
+        extent = max(world_size) - 1
+        size = number_of_objects + 1
+        super().__init__(spaces.Box(low=-extent, high=extent,
+                                    shape=(size, size, 3), dtype=np.float64))
+
+    def _rebuild(self, grid):
+        for channel, block in enumerate(grid.object_blocks()):
+            self.buffer[..., channel] = block
+
+    def _update(self, grid):
+        if grid.kernels is not None:
+            grid.kernels.update_grid_observation(
+                self.buffer, grid.x_agent, grid.y_agent, grid.items.x,
+                grid.items.y, grid.perm_contacts)
+            return
+        delta_x = grid.x_agent - grid.items.x
+        delta_y = grid.y_agent - grid.items.y
+        self.buffer[0, 0, 0] = grid.x_agent
+        self.buffer[0, 0, 1] = grid.y_agent
+        self.buffer[1:, 0, 0] = delta_x
+        self.buffer[1:, 0, 1] = delta_y
+        np.maximum(grid.perm_contacts[1:, 0],
+                   np.abs(delta_x) + np.abs(delta_y) <= 1,
+                   out=self.buffer[1:, 0, 2])
+
+
+class ProxObserver(Observer):
+    """The proximity map, see Gridworld.calculate_prox_map
+
+    The map itself is kept up to date incrementally by the Gridworld.
+    """
+
+    def __init__(self, reward_map):
+        reward_map = np.asarray(reward_map)
+        super().__init__(spaces.Box(
+            low=min(-1, reward_map.min()), high=max(1, reward_map.max()),
+            shape=(len(reward_map), 3), dtype=np.float64))
+
+    def _update(self, grid):
+        self.buffer[...] = grid.prox_map
+
+
+class VisionObserver(Observer):
+    """The egocentric window of Gridworld.return_vision, -inf off the grid
+
+    The window is copied out of the Gridworld's padded representation,
+    which is patched as items are consumed.
+    """
+
+    def __init__(self, x_dist, y_dist):
+        self.x_dist = x_dist
+        self.y_dist = y_dist
+        super().__init__(spaces.Box(
+            low=-np.inf, high=np.inf, shape=(2 * y_dist + 1, 2 * x_dist + 1),
+            dtype=np.float64))
+
+    def _update(self, grid):
+        self.buffer[...] = grid.return_vision(self.x_dist, self.y_dist)
+
+
+class RGBObserver(Observer):
+    """A ySize x xSize x 3 uint8 image, see Gridworld.get_representation
+
+    The image is painted once per layout; a step only repaints the cell
+    the agent left and the cell it is on.
+    """
+
+    def __init__(self, world_size):
+        super().__init__(spaces.Box(
+            low=0, high=255, shape=(world_size[1], world_size[0], 3),
+            dtype=np.uint8))
+        self._agent = None
+
+    def _rebuild(self, grid):
+        grid.get_representation(out=self.buffer, dtype=np.uint8)
+        self._agent = None
+
+    def _update(self, grid):
+        palette = grid._get_palette("FF0000", "0000FF", np.uint8)
+        if self._agent is not None:
+            x_coord, y_coord = self._agent
+            value = grid.representation[y_coord, x_coord]
+            self.buffer[y_coord, x_coord] = palette[
+                1 if value == 1 else 2 if value == -1 else 0]
+        self._agent = (grid.x_agent, grid.y_agent)
+        self.buffer[grid.y_agent, grid.x_agent] = palette[3]
+
+
+def make_observer(encoding, world_size, reward_map, vision_distance=(2, 2)):
+    """Create the observer of an encoding
+
+    Arguments:
+        encoding {string} -- "grid" (distance + contact tensor), "prox"
+            (proximity map), "vision" (egocentric window) or "rgb"
+        world_size {tuple} -- (xSize, ySize) of the world
+        reward_map {array of int} -- reward of each object
+
+    Keyword Arguments:
+        vision_distance {tuple} -- (x, y) distance seen by "vision"
+            (default: {(2, 2)})
+
+    Returns:
+        Observer -- observer whose space is the observation space
+    """
+    if encoding == "grid":
+        return GridObserver(world_size, len(reward_map))
+    if encoding == "prox":
+        return ProxObserver(reward_map)
+    if encoding == "vision":
+        return VisionObserver(*vision_distance)
+    if encoding == "rgb":
+        return RGBObserver(world_size)
+    raise Exception(f"Unknown observation encoding {encoding!r}!")
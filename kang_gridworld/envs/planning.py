@@ -0,0 +1,195 @@
+import numpy as np
+
+from .gym_mask import KangGrid
+from .items import ItemStore
+from .layouts import sample_layouts
+
+
+class TabularModel:
+    """Exact tabular model of one or many Gridworld layouts
+
+    A state is the agent cell plus the mask of consumed items, numbered
+    mask * (xSize * ySize) + y * xSize + x. The dynamics are deterministic,
+    so the transition model is stored sparsely as one successor per
+    (state, action):
+
+        next_state {(B, S, A) int} -- state reached by each action
+        reward {(B, S, A) float} -- reward of each action
+        done {(B, S, A) bool} -- whether the action ends the episode
+
+    where B is the number of layouts, S = 2^K * xSize * ySize and A the
+    number of actions. All layouts of a model share the world size and the
+    number of objects.
+    """
+
+    def __init__(self, items, world_size, action_effects,
+                 collision_penalty=0, terminal_reward=1, rewards=None):
+        """Compile layouts into transition tables
+
+        Arguments:
+            items {ItemStore} -- (B, K) items of the layouts
+            world_size {tuple} -- (xSize, ySize) of the worlds
+            action_effects {list} -- (dx, dy) of every action, see
+                Gridworld.ACTION_EFFECTS
+
+        Keyword Arguments:
+            collision_penalty {int} -- reward for an impossible move
+                (default: {0})
+            terminal_reward {int} -- a move scoring this reward ends the
+                episode, as in KangGrid.step; None to never end early
+                (default: {1})
+            rewards {array of float} -- (B, K) or (K,) float64 rewards of
+                the items, in place of the float32 items.reward, so that
+                the model pays exactly what the env pays (default: {None})
+        """
+        if items.shape[-1] > 16:
+            raise Exception("Too many objects to enumerate consumed masks!")
+        self.x_size, self.y_size = world_size
+        self.n_layouts, n_objects = items.shape
+        self.n_cells = self.x_size * self.y_size
+        self.n_states = self.n_cells << n_objects
+        layouts = np.arange(self.n_layouts)[:, None]
+
+        # bounds part, shared by every layout (see Gridworld._compile)
+        cells = np.arange(self.n_cells)
+        effects = np.array(action_effects)
+        x_end = (cells % self.x_size)[:, None] + effects[:, 0]
+        y_end = (cells // self.x_size)[:, None] + effects[:, 1]
+        x_clip = np.clip(x_end, 0, self.x_size - 1)
+        y_clip = np.clip(y_end, 0, self.y_size - 1)
+        in_bounds = (x_end == x_clip) & (y_end == y_clip)
+        target = y_clip * self.x_size + x_clip
+
+        # layout part: the cell -> item map, with a sentinel item K that is
+        # impassable and worth nothing standing for empty cells
+        item_cells = (items.y.astype(np.int64) * self.x_size + items.x)
+        cell_item = np.full((self.n_layouts, self.n_cells), n_objects)
+        cell_item[layouts, item_cells] = np.arange(n_objects)
+        passable = np.zeros((self.n_layouts, n_objects + 1), dtype=bool)
+        passable[:, :-1] = items.passable
+        if rewards is None:
+            rewards = items.reward
+        reward_table = np.zeros((self.n_layouts, n_objects + 1))
+        reward_table[:, :-1] = rewards
+
+        blocked = np.zeros((self.n_layouts, self.n_cells), dtype=bool)
+        blocked[layouts, item_cells] = ~items.passable
+        move_ok = in_bounds & ~blocked[:, target]
+        next_cell = np.where(move_ok, target, cells[:, None])
+        item = cell_item[layouts[:, :, None], next_cell]
+        item_bit = np.where(passable[layouts[:, :, None], item],
+                            1 << np.minimum(item, max(n_objects - 1, 0)), 0)
+        item_reward = reward_table[layouts[:, :, None], item]
+
+        # expand over the consumed masks: (B, M, C, A)
+        masks = np.arange(1 << n_objects)[None, :, None, None]
+        item_bit = item_bit[:, None]
+        fresh = (item_bit != 0) & (masks & item_bit == 0)
+        self.reward = np.where(
+            move_ok[:, None], np.where(fresh, item_reward[:, None], 0),
+            float(collision_penalty)).reshape(self.n_layouts, -1,
+                                              len(effects))
+        next_mask = masks | np.where(fresh, item_bit, 0)
+        self.next_state = (next_mask * self.n_cells +
+                           next_cell[:, None]).reshape(self.reward.shape)
+        if terminal_reward is None:
+            self.done = np.zeros(self.reward.shape, dtype=bool)
+        else:
+            self.done = self.reward == terminal_reward
+
+    @classmethod
+    def from_gridworld(cls, grid, terminal_reward=1):
+        """Compile the current layout of a Gridworld
+
+        Consumed items are part of the state, so the model also serves
+        worlds in the middle of an episode; see state_index.
+
+        Arguments:
+            grid {Gridworld} -- world to compile
+
+        Keyword Arguments:
+            terminal_reward {int} -- see __init__ (default: {1})
+
+        Returns:
+            TabularModel -- model with a single layout
+        """
+        return cls(grid.items[None], (grid.x_size, grid.y_size),
+                   grid.ACTION_EFFECTS, grid.collision_penalty,
+                   terminal_reward, grid._layout_reward)
+
+    def state_index(self, x_coord, y_coord, consumed):
+        """Number a state
+
+        Arguments:
+            x_coord {int or array} -- agent x coordinate
+            y_coord {int or array} -- agent y coordinate
+            consumed {array of bool} -- (..., K) consumed items
+
+        Returns:
+            int or array -- index of the state
+        """
+        consumed = np.asarray(consumed, dtype=np.int64)
+        mask = (consumed << np.arange(consumed.shape[-1])).sum(axis=-1)
+        return (mask * self.n_cells + np.asarray(y_coord) * self.x_size +
+                x_coord)
+
+    def solve(self, horizon=50, discount=1.0):
+        """Finite-horizon value iteration over every layout at once
+
+        Iteration stops early once the values reach a fixed point, after
+        which the values and policies of longer horizons are the same.
+
+        Keyword Arguments:
+            horizon {int} -- number of actions left, 50 for a fresh
+                KangGrid episode (default: {50})
+            discount {float} -- discount factor (default: {1.0})
+
+        Returns:
+            matrix, matrix -- (B, S) optimal returns with horizon actions
+            left, and (B, horizon, S) int8 optimal actions where
+            policy[:, h, s] is the action to take in s with h + 1 actions
+            left
+        """
+        flat_next = (self.next_state +
+                     np.arange(self.n_layouts)[:, None, None] * self.n_states)
+        continuing = discount * ~self.done
+        values = np.zeros((self.n_layouts, self.n_states))
+        policy = np.empty((self.n_layouts, horizon, self.n_states),
+                          dtype=np.int8)
+        for steps in range(horizon):
+            q_values = self.reward + continuing * np.take(values, flat_next)
+            policy[:, steps] = q_values.argmax(axis=2)
+            new_values = q_values.max(axis=2)
+            if np.array_equal(new_values, values):
+                policy[:, steps + 1:] = policy[:, steps, None]
+                break
+            values = new_values
+        return values, policy
+
+
+def solve_layouts(rng, count, world_size, reward_map, collision_penalty=0,
+                  horizon=50):
+    """Solve fresh random layouts, as laid out by KangGrid._create_env
+
+    Arguments:
+        rng {np.random.Generator} -- source of randomness
+        count {int} -- number of layouts
+        world_size {tuple} -- (xSize, ySize) of the worlds
+        reward_map {array of int} -- reward of each object
+
+    Keyword Arguments:
+        collision_penalty {int} -- reward for an impossible move
+            (default: {0})
+        horizon {int} -- number of actions per episode (default: {50})
+
+    Returns:
+        ItemStore, array -- (count, K) layouts and the optimal return of each
+        from the agent's start at (0, 0)
+    """
+    items = ItemStore.from_layouts(
+        sample_layouts(rng, count, world_size, len(reward_map)), reward_map)
+    model = TabularModel(items, world_size, KangGrid._ACTION_DEF,
+                         collision_penalty, rewards=reward_map)
+    values, _ = model.solve(horizon)
+    # the start state is cell 0 with nothing consumed
+    return items, values[:, 0]
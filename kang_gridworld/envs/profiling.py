@@ -0,0 +1,105 @@
+import cProfile
+import pstats
+
+from time import perf_counter_ns
+
+import numpy as np
+
+
+class PhaseTimer:
+    """Cumulative time and call count of the phases of a step
+
+    Install with KangGrid.set_profiler(timer). KangGrid and its Gridworld
+    then time their phases with perf_counter_ns:
+
+        step -- all of KangGrid.step
+        move_agent -- Gridworld.move_agent
+        prox_map -- bringing the lazy proximity map up to date
+        observation -- building the observation of a step or reset
+        telemetry -- the telemetry hook, if any
+        reset -- all of KangGrid.reset
+
+    Nothing is timed while no timer is installed.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Forget every recorded phase
+        """
+        self.total_ns = {}
+        self.calls = {}
+
+    def add(self, phase, start):
+        """Record one call of a phase
+
+        Arguments:
+            phase {string} -- name of the phase
+            start {int} -- perf_counter_ns() at the start of the call
+        """
+        elapsed = perf_counter_ns() - start
+        self.total_ns[phase] = self.total_ns.get(phase, 0) + elapsed
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def stats(self):
+        """Aggregate the phases
+
+        Returns:
+            dict -- for every phase, its calls, total_ms and mean_us
+        """
+        return {phase: {"calls": self.calls[phase],
+                        "total_ms": total / 1e6,
+                        "mean_us": total / 1e3 / self.calls[phase]}
+                for phase, total in self.total_ns.items()}
+
+
+def profile_steps(env, steps, path=None, seed=0):
+    """Run random steps under cProfile and a PhaseTimer
+
+    Episodes are reset when done. Any wrappers around the KangGrid (such as
+    the TimeLimit of gym.make) are profiled too; the time they add shows up
+    as the "wrapper" phase.
+
+    Arguments:
+        env {gym.Env} -- KangGrid, or a wrapper around one
+        steps {int} -- number of steps
+
+    Keyword Arguments:
+        path {string} -- also dump the pstats snapshot to this file, for
+            snakeviz or python -m pstats (default: {None})
+        seed {int} -- seed of the random actions (default: {0})
+
+    Returns:
+        pstats.Stats, dict -- the profile and PhaseTimer.stats()
+    """
+    kang_grid = env.unwrapped
+    previous = kang_grid.profiler
+    timer = PhaseTimer()
+    kang_grid.set_profiler(timer)
+    actions = np.random.default_rng(seed).integers(
+        0, kang_grid.action_space.n, steps).tolist()
+    profiler = cProfile.Profile()
+    outer_ns = 0
+    try:
+        env.reset()
+        profiler.enable()
+        for action in actions:
+            start = perf_counter_ns()
+            _, _, done, _ = env.step(action)
+            outer_ns += perf_counter_ns() - start
+            if done:
+                env.reset()
+        profiler.disable()
+    finally:
+        kang_grid.set_profiler(previous)
+
+    stats = timer.stats()
+    if "step" in timer.total_ns:
+        wrapper_ns = outer_ns - timer.total_ns["step"]
+        stats["wrapper"] = {"calls": steps, "total_ms": wrapper_ns / 1e6,
+                            "mean_us": wrapper_ns / 1e3 / max(steps, 1)}
+    profile = pstats.Stats(profiler)
+    if path is not None:
+        profile.dump_stats(path)
+    return profile, stats
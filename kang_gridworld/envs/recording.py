@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+
+import gym
+import numpy as np
+
+_VIDEO_CODECS = {"mp4": "mp4v", "avi": "MJPG"}
+
+
+class FrameRecorder(gym.Wrapper):
+    """Record the rgb_array frames of every episode in a background thread
+
+    Stepping only copies the small ySize x xSize frame; upscaling and
+    encoding happen on a writer thread. Each episode is written when the
+    next one starts, or on close, as directory/episode_000000.<format>:
+
+        npz -- the (T, H, W, 3) uint8 frames, with numpy only
+        png -- a directory of one image per frame, needs OpenCV
+        mp4, avi -- a video, needs OpenCV
+
+    Call close() to wait for every episode to be written.
+    """
+
+    def __init__(self, env, directory, file_format="npz", scale=20, fps=10,
+                 max_pending=16):
+        """Wrap an env
+
+        Arguments:
+            env {gym.Env} -- KangGrid, or a wrapper around one
+            directory {string} -- where the episodes are written
+
+        Keyword Arguments:
+            file_format {string} -- "npz", "png", "mp4" or "avi"
+                (default: {"npz"})
+            scale {int} -- pixels per cell in the written frames
+                (default: {20})
+            fps {int} -- frame rate of videos (default: {10})
+            max_pending {int} -- finished episodes waiting to be written
+                before end of episode blocks (default: {16})
+        """
+        super().__init__(env)
+        if file_format not in ("npz", "png") + tuple(_VIDEO_CODECS):
+            raise Exception(f"Unknown file format {file_format!r}!")
+        if file_format != "npz":
+            # fail now rather than on the writer thread
+            import cv2  # noqa: F401
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.file_format = file_format
+        self.scale = scale
+        self.fps = fps
+        self.episodes = 0
+        self._frames = []
+        self._error = None
+        self._pending = queue.Queue(max_pending)
+        self._writer = threading.Thread(target=self._write_episodes,
+                                        daemon=True)
+        self._writer.start()
+
+    def reset(self, **kwargs):
+        self.end_episode()
+        observation = self.env.reset(**kwargs)
+        self._capture()
+        return observation
+
+    def step(self, action):
+        result = self.env.step(action)
+        self._capture()
+        return result
+
+    def _capture(self):
+        self._frames.append(self.env.render(mode="rgb_array"))
+
+    def end_episode(self):
+        """Hand the frames of the current episode to the writer thread
+        """
+        self._raise_writer_error()
+        if self._frames:
+            self._pending.put((self.episodes, self._frames))
+            self.episodes += 1
+            self._frames = []
+
+    def close(self):
+        """Write the current episode, wait for the writer and close the env
+        """
+        if self._writer.is_alive():
+            self.end_episode()
+            self._pending.put(None)
+            self._writer.join()
+        self._raise_writer_error()
+        return self.env.close()
+
+    def _raise_writer_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_episodes(self):
+        while True:
+            episode = self._pending.get()
+            if episode is None:
+                return
+            try:
+                self._write(*episode)
+            except Exception as error:
+                self._error = error
+
+    def _write(self, index, frames):
+        """Upscale and encode one episode
+
+        Arguments:
+            index {int} -- episode number
+            frames {list of matrix} -- H x W x 3 uint8 RGB frames
+        """
+        frames = np.stack(frames)
+        frames = frames.repeat(self.scale, axis=1).repeat(self.scale, axis=2)
+        path = os.path.join(self.directory, f"episode_{index:06d}")
+        if self.file_format == "npz":
+            np.savez_compressed(path + ".npz", frames=frames)
+            return
+
+        import cv2
+
+        # OpenCV wants BGR
+        frames = frames[..., ::-1]
+        if self.file_format == "png":
+            os.makedirs(path, exist_ok=True)
+            for step, frame in enumerate(frames):
+                cv2.imwrite(os.path.join(path, f"{step:06d}.png"), frame)
+            return
+        height, width = frames.shape[1:3]
+        writer = cv2.VideoWriter(
+            f"{path}.{self.file_format}",
+            cv2.VideoWriter_fourcc(*_VIDEO_CODECS[self.file_format]),
+            self.fps, (width, height))
+        try:
+            for frame in frames:
+                writer.write(np.ascontiguousarray(frame))
+        finally:
+            writer.release()
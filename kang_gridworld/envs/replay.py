@@ -0,0 +1,277 @@
+import os
+import queue
+import threading
+
+import gym
+import numpy as np
+
+# per-row columns of a shard, and their shape after the row axis. A row
+# holds the state after a step; rows with action -1 only hold the state the
+# next transition starts from (after a reset, or at the start of a shard)
+_COLUMNS = (("observation", np.int32, ()), ("action", np.int8, ()),
+            ("reward", np.float32, ()), ("done", np.bool_, ()),
+            ("position", np.int16, (2,)))
+_SHARD_PREFIX = "shard_"
+
+
+class ReplayRecorder(gym.Wrapper):
+    """Record every transition into typed chunks written as replay shards
+
+    Rows are written into preallocated chunks of chunk_size steps: the
+    action as int8, the agent position as int16, the reward as float32 and
+    the observation as an int32 index into a table of the distinct
+    observations of the chunk. The layout is static during an episode, so
+    an observation repeats whenever the agent comes back to a state, and is
+    stored once per chunk.
+
+    Full chunks are written by a background thread as
+    directory/shard_000000.npz (compressed) or, without compression, as a
+    directory/shard_000000/ directory of .npy files that ReplayDataset can
+    memory map. At most max_pending chunks wait for the writer before
+    stepping blocks. Call close() to write the last chunk and wait for the
+    writer.
+    """
+
+    def __init__(self, env, directory, chunk_size=65536, compress=True,
+                 max_pending=4):
+        """Wrap an env
+
+        Arguments:
+            env {gym.Env} -- KangGrid, or a wrapper around one
+            directory {string} -- where the shards are written
+
+        Keyword Arguments:
+            chunk_size {int} -- rows per shard (default: {65536})
+            compress {bool} -- write compressed .npz shards rather than
+                directories of .npy files (default: {True})
+            max_pending {int} -- full chunks waiting to be written before
+                stepping blocks (default: {4})
+        """
+        super().__init__(env)
+        if chunk_size < 2:
+            raise Exception("A chunk needs room for at least 2 rows!")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.shards = 0
+        self._error = None
+
+        # the chunks are recycled once written, so memory stays bounded
+        self._free = queue.Queue()
+        for _ in range(max_pending + 1):
+            self._free.put({
+                name: np.zeros((chunk_size,) + shape, dtype=dtype)
+                for name, dtype, shape in _COLUMNS})
+        self._pending = queue.Queue()
+        self._start_chunk(self._free.get())
+        self._last = None
+        self._writer = threading.Thread(target=self._write_shards,
+                                        daemon=True)
+        self._writer.start()
+
+    def reset(self, **kwargs):
+        observation = self.env.reset(**kwargs)
+        self._record(observation, -1, 0, False)
+        return observation
+
+    def step(self, action):
+        result = self.env.step(action)
+        observation, reward, done, _ = result
+        self._record(observation, action, reward, done)
+        return result
+
+    def _start_chunk(self, chunk):
+        self._chunk = chunk
+        self._rows = 0
+        self._table = {}
+        self._observations = []
+
+    def _record(self, observation, action, reward, done):
+        if self._rows == self.chunk_size:
+            self.flush()
+        if self._rows == 0 and action >= 0 and self._last is not None:
+            # transitions never span shards
+            self._write_row(*self._last, -1, 0, False)
+        self._write_row(observation, self.env.unwrapped._get_agent_coords(),
+                        action, reward, done)
+
+    def _write_row(self, observation, position, action, reward, done):
+        key = observation.tobytes()
+        index = self._table.get(key)
+        if index is None:
+            index = self._table[key] = len(self._observations)
+            observation = np.array(observation)
+            self._observations.append(observation)
+        else:
+            observation = self._observations[index]
+        self._last = (observation, position)
+
+        row = self._rows
+        chunk = self._chunk
+        chunk["observation"][row] = index
+        chunk["action"][row] = action
+        chunk["reward"][row] = reward
+        chunk["done"][row] = done
+        chunk["position"][row] = position
+        self._rows = row + 1
+
+    def flush(self):
+        """Hand the rows recorded so far to the writer thread as a shard
+        """
+        self._raise_writer_error()
+        if self._rows:
+            self._pending.put((self.shards, self._chunk, self._rows,
+                               self._observations))
+            self.shards += 1
+            self._start_chunk(self._free.get())
+
+    def close(self):
+        """Write the last shard, wait for the writer and close the env
+        """
+        if self._writer.is_alive():
+            self.flush()
+            self._pending.put(None)
+            self._writer.join()
+        self._raise_writer_error()
+        return self.env.close()
+
+    def _raise_writer_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_shards(self):
+        while True:
+            shard = self._pending.get()
+            if shard is None:
+                return
+            try:
+                self._write(*shard)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._free.put(shard[1])
+
+    def _write(self, index, chunk, rows, observations):
+        """Write one shard, under a temporary name until it is complete
+
+        Arguments:
+            index {int} -- shard number
+            chunk {dict} -- columns of the chunk
+            rows {int} -- rows of the chunk in use
+            observations {list of matrix} -- distinct observations
+        """
+        arrays = {name: chunk[name][:rows] for name, _, _ in _COLUMNS}
+        arrays["observations"] = np.stack(observations)
+        path = os.path.join(self.directory, f"{_SHARD_PREFIX}{index:06d}")
+        if self.compress:
+            with open(path + ".tmp", "wb") as shard:
+                np.savez_compressed(shard, **arrays)
+            os.replace(path + ".tmp", path + ".npz")
+            return
+        os.makedirs(path + ".tmp", exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path + ".tmp", name + ".npy"), array)
+        os.replace(path + ".tmp", path)
+
+
+class ReplayDataset:
+    """The transitions of the shards written by ReplayRecorder
+
+    Uncompressed shards are memory mapped while they are read. All shards
+    are then held as a few compact columns, and transitions are only
+    assembled, with their observations, by sample and transitions.
+    """
+
+    def __init__(self, directory, seed=None):
+        """Load every complete shard of a directory
+
+        Arguments:
+            directory {string} -- directory given to ReplayRecorder
+
+        Keyword Arguments:
+            seed {int} -- seed of sample (default: {None})
+        """
+        columns = {name: [] for name, _, _ in _COLUMNS}
+        tables = []
+        transitions = []
+        rows = 0
+        for entry in sorted(os.listdir(directory)):
+            if (not entry.startswith(_SHARD_PREFIX)
+                    or entry.endswith(".tmp")):
+                continue
+            shard = _load_shard(os.path.join(directory, entry))
+            # a row after the first of its shard is a transition from the
+            # row before it, unless it starts an episode
+            starts = np.flatnonzero(shard["action"][1:] >= 0) + 1
+            transitions.append(starts + rows)
+            shard["observation"] = shard["observation"] + sum(
+                len(table) for table in tables)
+            for name in columns:
+                columns[name].append(shard[name])
+            tables.append(shard["observations"])
+            rows += len(shard["action"])
+        if not tables:
+            raise Exception(f"No replay shards in {directory}!")
+
+        self.observations = np.concatenate(tables)
+        self.observation_ids = np.concatenate(columns["observation"])
+        self.actions = np.concatenate(columns["action"])
+        self.rewards = np.concatenate(columns["reward"])
+        self.dones = np.concatenate(columns["done"])
+        self.positions = np.concatenate(columns["position"])
+        self._transitions = np.concatenate(transitions)
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self._transitions)
+
+    def sample(self, batch_size):
+        """Sample a minibatch of transitions uniformly, with replacement
+
+        Arguments:
+            batch_size {int} -- number of transitions
+
+        Returns:
+            dict -- see transitions
+        """
+        rows = self._transitions[
+            self.rng.integers(0, len(self._transitions), batch_size)]
+        return self._gather(rows)
+
+    def transitions(self):
+        """Return every transition, in recording order
+
+        Returns:
+            dict -- arrays of observation, action, reward, next_observation,
+            done and position (of the agent after the step)
+        """
+        return self._gather(self._transitions)
+
+    def export(self, path):
+        """Write every transition to one compressed .npz file
+
+        Arguments:
+            path {string} -- file to write
+        """
+        np.savez_compressed(path, **self.transitions())
+
+    def _gather(self, rows):
+        ids = self.observation_ids
+        return {"observation": self.observations[ids[rows - 1]],
+                "action": self.actions[rows],
+                "reward": self.rewards[rows],
+                "next_observation": self.observations[ids[rows]],
+                "done": self.dones[rows],
+                "position": self.positions[rows]}
+
+
+def _load_shard(path):
+    """Read the arrays of a shard, memory mapping uncompressed ones"""
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    return {name[:-len(".npy")]: np.load(os.path.join(path, name),
+                                         mmap_mode="r")
+            for name in os.listdir(path)}
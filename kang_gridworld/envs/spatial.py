@@ -0,0 +1,168 @@
+import numpy as np
+
+from .buffers import store_array
+
+
+class ItemIndex:
+    """Spatial index of the items of a Gridworld
+
+    Keeps a dense cell -> item map for O(1) "what is on this cell" queries,
+    and sorts the items into square buckets of about one item each so that
+    nearest-item queries only look at the buckets around the query cell.
+    Consumed items are discarded from the index.
+    """
+
+    def __init__(self, x_size, y_size):
+        """Create an empty index
+
+        Arguments:
+            x_size {int} -- size of the world in the x direction
+            y_size {int} -- size of the world in the y direction
+        """
+        self.x_size = x_size
+        self.y_size = y_size
+        # cells are numbered y * xSize + x
+        self.cell_item = np.full(x_size * y_size, -1)
+        self.item_cells = np.zeros(0, dtype=np.int64)
+        self.build(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def build(self, x_coords, y_coords):
+        """Index a new set of items, replacing the previous ones
+
+        Arguments:
+            x_coords {array of int} -- x coordinate of each item
+            y_coords {array of int} -- y coordinate of each item
+        """
+        x_coords = np.asarray(x_coords, dtype=np.int64)
+        y_coords = np.asarray(y_coords, dtype=np.int64)
+        self.cell_item[self.item_cells] = -1
+        store_array(self, "item_cells", y_coords * self.x_size + x_coords)
+        self.cell_item[self.item_cells] = np.arange(len(self.item_cells))
+        store_array(self, "x_coords", np.array(x_coords))
+        store_array(self, "y_coords", np.array(y_coords))
+        store_array(self, "live", np.ones(len(self.item_cells), dtype=bool))
+
+        self.bucket_size = max(1, int(np.sqrt(
+            self.x_size * self.y_size / max(1, len(self.item_cells)))))
+        self.x_buckets = -(-self.x_size // self.bucket_size)
+        self.y_buckets = -(-self.y_size // self.bucket_size)
+        buckets = ((y_coords // self.bucket_size) * self.x_buckets +
+                   x_coords // self.bucket_size)
+        store_array(self, "_bucket_items", np.argsort(buckets, kind="stable"))
+        store_array(self, "_bucket_starts", np.searchsorted(
+            buckets[self._bucket_items],
+            np.arange(self.x_buckets * self.y_buckets + 1)))
+
+    def discard(self, index):
+        """Remove a consumed item from the index
+
+        Arguments:
+            index {int} -- row of the item in item_list
+        """
+        if self.live[index]:
+            self.live[index] = False
+            self.cell_item[self.item_cells[index]] = -1
+
+    def discard_many(self, indices):
+        """Vectorized discard
+
+        Arguments:
+            indices {array of int} -- rows of the items in item_list
+        """
+        self.live[indices] = False
+        self.cell_item[self.item_cells[indices]] = -1
+
+    def restore(self, index):
+        """Put a discarded item back into the index
+
+        Arguments:
+            index {int} -- row of the item in item_list
+        """
+        if not self.live[index]:
+            self.live[index] = True
+            self.cell_item[self.item_cells[index]] = index
+
+    def item_at(self, x_coord, y_coord):
+        """Return the item on a cell
+
+        Arguments:
+            x_coord {int} -- x coordinate of the cell
+            y_coord {int} -- y coordinate of the cell
+
+        Returns:
+            int -- row of the item in item_list, -1 if the cell is empty
+        """
+        return int(self.cell_item[y_coord * self.x_size + x_coord])
+
+    def items_at(self, x_coords, y_coords):
+        """Vectorized item_at
+
+        Arguments:
+            x_coords {array of int} -- x coordinates of the cells
+            y_coords {array of int} -- y coordinates of the cells
+
+        Returns:
+            array of int -- item of each cell, -1 where empty
+        """
+        return self.cell_item[
+            np.asarray(y_coords, dtype=np.int64) * self.x_size +
+            np.asarray(x_coords, dtype=np.int64)]
+
+    def nearest(self, x_coord, y_coord):
+        """Return the remaining item closest to a cell
+
+        Distances are Manhattan distances; ties go to the lowest item index.
+        Rings of buckets are searched outwards until no closer item can
+        exist, so with spread-out items only a few buckets are visited.
+
+        Arguments:
+            x_coord {int} -- x coordinate of the cell
+            y_coord {int} -- y coordinate of the cell
+
+        Returns:
+            int, int -- row of the item in item_list and its distance, or
+            (-1, -1) if no item remains
+        """
+        x_bucket = x_coord // self.bucket_size
+        y_bucket = y_coord // self.bucket_size
+        best, best_distance = -1, -1
+        for ring in range(max(self.x_buckets, self.y_buckets)):
+            # items in this ring are at least this far from the cell
+            if best >= 0 and (ring - 1) * self.bucket_size + 1 > best_distance:
+                break
+            candidates = self._ring_items(x_bucket, y_bucket, ring)
+            candidates = candidates[self.live[candidates]]
+            if not len(candidates):
+                continue
+            distances = (np.abs(self.x_coords[candidates] - x_coord) +
+                         np.abs(self.y_coords[candidates] - y_coord))
+            closest = distances.min()
+            if best < 0 or closest <= best_distance:
+                choice = candidates[distances == closest].min()
+                if best < 0 or closest < best_distance or choice < best:
+                    best, best_distance = int(choice), int(closest)
+        return best, best_distance
+
+    def _ring_items(self, x_bucket, y_bucket, ring):
+        """Return the items of the buckets exactly ring buckets away
+
+        Returns:
+            array of int -- item indices
+        """
+        x_low, x_high = x_bucket - ring, x_bucket + ring
+        y_low, y_high = y_bucket - ring, y_bucket + ring
+        buckets = []
+        for y in range(max(y_low, 0), min(y_high, self.y_buckets - 1) + 1):
+            if y in (y_low, y_high):
+                columns = range(max(x_low, 0),
+                                min(x_high, self.x_buckets - 1) + 1)
+            else:
+                columns = [x for x in (x_low, x_high)
+                           if 0 <= x < self.x_buckets]
+            buckets.extend(y * self.x_buckets + x for x in columns)
+        if not buckets:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([
+            self._bucket_items[self._bucket_starts[bucket]:
+                               self._bucket_starts[bucket + 1]]
+            for bucket in buckets])
@@ -0,0 +1,161 @@
+import json
+
+import numpy as np
+
+from .items import ItemStore
+
+# item columns, in file order. Rewards are saved as float64, so that a
+# reward of 0.1 is loaded as 0.1 rather than as its float32 value
+_COLUMNS = (("reward", np.float64), ("x", np.int16), ("y", np.int16),
+            ("flags", np.uint8))
+_MAGIC = b"KGBANK2\n"
+_ALIGN = 64
+
+
+def _columns(items, rewards):
+    """Return the file columns of items, with rewards in place of the
+    float32 items.reward when given"""
+    columns = {name: np.asarray(getattr(items, name), dtype=dtype)
+               for name, dtype in _COLUMNS}
+    if rewards is not None:
+        columns["reward"] = np.broadcast_to(
+            np.asarray(rewards, dtype=np.float64), items.shape)
+    return columns
+
+
+def save_items(path, items, world_size, collision_penalty=0, rewards=None):
+    """Save the items of one world to a .npz file
+
+    Only numpy arrays are stored, so loading never unpickles anything.
+
+    Arguments:
+        path {string} -- file to write
+        items {ItemStore} -- (K,) items
+        world_size {tuple} -- (xSize, ySize) of the world
+
+    Keyword Arguments:
+        collision_penalty {int} -- reward for an impossible move
+            (default: {0})
+        rewards {array of float} -- (K,) float64 rewards to save instead of
+            items.reward, such as the rewards the world was created with;
+            consumed items are loaded with a reward of 0 either way
+            (default: {None})
+    """
+    np.savez(path, world_size=np.array(world_size),
+             collision_penalty=np.array(collision_penalty),
+             **_columns(items, rewards))
+
+
+def load_items(path):
+    """Load a world saved by save_items
+
+    Arguments:
+        path {string} -- file to read
+
+    Returns:
+        ItemStore, tuple, int, array -- the items, (xSize, ySize), the
+        collision penalty and the saved float64 rewards
+    """
+    with np.load(path, allow_pickle=False) as data:
+        items = ItemStore(data["x"].shape)
+        for name, _ in _COLUMNS:
+            getattr(items, name)[...] = data[name]
+        rewards = data["reward"].astype(np.float64)
+        world_size = tuple(int(size) for size in data["world_size"])
+        collision_penalty = data["collision_penalty"].item()
+    items.reward[items.consumed] = 0
+    return items, world_size, collision_penalty, rewards
+
+
+def _sections(count, number_of_objects, start):
+    """Return the (name, dtype, offset) of every column of a bank"""
+    sections = []
+    for name, dtype in _COLUMNS:
+        start = -(-start // _ALIGN) * _ALIGN
+        sections.append((name, dtype, start))
+        start += count * number_of_objects * np.dtype(dtype).itemsize
+    return sections, start
+
+
+def write_bank(path, items, world_size, collision_penalty=0, rewards=None):
+    """Write many layouts to a memory-mappable layout bank
+
+    The file is a small JSON header followed by the reward (float64), x, y
+    and flags columns of all worlds, each a contiguous, aligned (N, K)
+    array, so that LayoutBank can map them without copying.
+
+    Arguments:
+        path {string} -- file to write
+        items {ItemStore} -- (N, K) items of the worlds
+        world_size {tuple} -- (xSize, ySize) shared by the worlds
+
+    Keyword Arguments:
+        collision_penalty {int} -- reward for an impossible move
+            (default: {0})
+        rewards {array of float} -- (N, K) or (K,) float64 rewards to write
+            instead of items.reward, such as the reward_map the layouts
+            were made with (default: {None})
+    """
+    count, number_of_objects = items.shape
+    header = json.dumps({
+        "count": count, "objects": number_of_objects,
+        "world_size": [int(size) for size in world_size],
+        "collision_penalty": collision_penalty}).encode()
+    prefix = _MAGIC + len(header).to_bytes(4, "little") + header
+    sections, size = _sections(count, number_of_objects, len(prefix))
+
+    columns = _columns(items, rewards)
+    with open(path, "wb") as bank:
+        bank.write(prefix)
+        for name, _, offset in sections:
+            bank.write(b"\0" * (offset - bank.tell()))
+            bank.write(np.ascontiguousarray(columns[name]).tobytes())
+        bank.write(b"\0" * (size - bank.tell()))
+
+
+class LayoutBank:
+    """Read-only, memory-mapped view of a file written by write_bank
+
+    Opening the bank only reads its header; world i is served as views into
+    the mapped columns in O(1), and the pages of the file are shared by all
+    processes that open it. The reward column of the served items is the
+    float64 column of the file.
+    """
+
+    def __init__(self, path):
+        """Open a bank
+
+        Arguments:
+            path {string} -- file written by write_bank
+        """
+        with open(path, "rb") as bank:
+            if bank.read(len(_MAGIC)) != _MAGIC:
+                raise Exception(f"{path} is not a layout bank!")
+            length = int.from_bytes(bank.read(4), "little")
+            header = json.loads(bank.read(length))
+        self.path = path
+        self.world_size = tuple(header["world_size"])
+        self.collision_penalty = header["collision_penalty"]
+        shape = (header["count"], header["objects"])
+        sections, _ = _sections(*shape, len(_MAGIC) + 4 + length)
+
+        self.items = ItemStore.__new__(ItemStore)
+        for name, dtype, offset in sections:
+            if shape[0] * shape[1]:
+                column = np.memmap(path, dtype=dtype, mode="r",
+                                   offset=offset, shape=shape)
+            else:
+                column = np.zeros(shape, dtype=dtype)
+            setattr(self.items, name, column)
+
+    def __len__(self):
+        return self.items.shape[0]
+
+    def __getitem__(self, index):
+        """Return the items of world index (or of a slice of worlds)
+
+        Returns:
+            ItemStore -- read-only views into the bank; pass them to
+            Gridworld.reset_layout, which copies them into the world
+        """
+        return self.items[index]
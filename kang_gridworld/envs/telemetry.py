@@ -0,0 +1,128 @@
+from time import perf_counter
+
+import numpy as np
+
+
+class StepRecorder:
+    """Ring buffer of per-step telemetry for KangGrid.
+
+    Install with KangGrid.set_telemetry(recorder). Each step is written into
+    preallocated arrays, so recording never formats strings or grows memory;
+    once the buffer is full the oldest steps are overwritten. Counters are
+    kept for every step ever recorded, not only the ones still buffered.
+
+    An episode ends with a done step or, when a wrapper such as gym.make's
+    TimeLimit cuts it short, with the end_episode call of the next
+    KangGrid.reset.
+    """
+
+    def __init__(self, capacity=65536):
+        """Create a recorder
+
+        Keyword Arguments:
+            capacity {int} -- number of steps kept in the buffer
+                (default: {65536})
+        """
+        self.capacity = capacity
+        self.epochs = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.positions = np.zeros((capacity, 2), dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.collisions = np.zeros(capacity, dtype=bool)
+        self.clear()
+
+    def clear(self):
+        """Forget every recorded step and reset the counters
+        """
+        self._cursor = 0
+        self._start_time = None
+        self.total_steps = 0
+        self.total_episodes = 0
+        self.total_collisions = 0
+        self.total_episode_steps = 0
+        # epoch of the last step of an episode that has not ended yet
+        self._episode_epoch = None
+
+    def __call__(self, epoch, action, position, reward, done, collided):
+        """Record one step; this is the KangGrid telemetry hook signature
+
+        Arguments:
+            epoch {int} -- epoch of the world after the step
+            action {int} -- index of the action taken
+            position {(int, int)} -- agent coordinates after the step
+            reward {int} -- reward of the step
+            done {bool} -- whether the step ended the episode
+            collided {bool} -- whether the move was impossible
+        """
+        if self._start_time is None:
+            self._start_time = perf_counter()
+
+        index = self._cursor
+        self.epochs[index] = epoch
+        self.actions[index] = action
+        self.positions[index] = position
+        self.rewards[index] = reward
+        self.dones[index] = done
+        self.collisions[index] = collided
+        self._cursor = (index + 1) % self.capacity
+
+        self.total_steps += 1
+        if collided:
+            self.total_collisions += 1
+        if done:
+            self._end_episode(epoch)
+        else:
+            self._episode_epoch = epoch
+
+    def end_episode(self):
+        """Count the running episode as ended; KangGrid.reset calls this
+
+        Does nothing when no step was recorded since the last episode ended.
+        """
+        if self._episode_epoch is not None:
+            self._end_episode(self._episode_epoch)
+
+    def _end_episode(self, epoch):
+        self.total_episodes += 1
+        self.total_episode_steps += epoch
+        self._episode_epoch = None
+
+    def records(self):
+        """Return the buffered steps, oldest first
+
+        Returns:
+            dict -- arrays of epoch, action, position, reward, done and
+            collided for every buffered step
+        """
+        if self.total_steps < self.capacity:
+            order = np.arange(self.total_steps)
+        else:
+            order = np.roll(np.arange(self.capacity), -self._cursor)
+        return {"epoch": self.epochs[order],
+                "action": self.actions[order],
+                "position": self.positions[order],
+                "reward": self.rewards[order],
+                "done": self.dones[order],
+                "collided": self.collisions[order]}
+
+    def stats(self):
+        """Aggregate the counters
+
+        Returns:
+            dict -- steps, steps_per_sec (since the first recorded step),
+            episodes, mean_episode_length and collision_rate
+        """
+        elapsed = 0.0
+        if self._start_time is not None:
+            elapsed = perf_counter() - self._start_time
+        return {
+            "steps": self.total_steps,
+            "steps_per_sec": self.total_steps / elapsed if elapsed else 0.0,
+            "episodes": self.total_episodes,
+            "mean_episode_length": (
+                self.total_episode_steps / self.total_episodes
+                if self.total_episodes else 0.0),
+            "collision_rate": (self.total_collisions / self.total_steps
+                               if self.total_steps else 0.0),
+        }
@@ -0,0 +1,316 @@
+import numpy as np
+
+from gym import spaces
+
+from . import distance, layouts, vision
+from .gym_mask import KangGrid
+from .items import PASSABLE, ItemStore
+from .observations import make_observer
+
+
+class KangGridVec:
+    """Batch of independent KangGrid worlds stepped with array operations
+
+    Every world keeps the same state as a single Gridworld, but stacked along
+    a leading world axis:
+
+        representation {(N, H, W) float} -- reward value of every cell
+        blocks {(N, H, W) bool} -- impassable cells
+        items {(N, K) ItemStore} -- reward / x / y / flags of every object
+        x_agent, y_agent, epoch {(N,) int}
+        prox_map {(N, K, 3) float} -- see Gridworld.calculate_prox_map
+        perm_contacts {(N, K + 1, K + 1) float} -- see
+            Gridworld.calculate_grid_map
+
+    The observation of each world is encoded like KangGrid's: the
+    distance + contact tensor by default, or the proximity map or vision
+    window (the "rgb" encoding is only offered by KangGrid).
+    """
+    _ACTION_DEF = np.array(KangGrid._ACTION_DEF)
+
+    def __init__(self, num_envs, world_size=(5, 5), reward_map=(1, -1),
+                 collision_penalty=0, max_epoch=50, seed=None,
+                 observation="grid", vision_distance=(2, 2)):
+        """Create num_envs worlds, each laid out like KangGrid._create_env
+
+        Arguments:
+            num_envs {int} -- number of worlds to step together
+
+        Keyword Arguments:
+            world_size {tuple} -- (xSize, ySize) of every world
+                (default: {(5, 5)})
+            reward_map {tuple of int} -- reward of each object, which also
+                sets the number of objects per world (default: {(1, -1)})
+            collision_penalty {int} -- reward for an impossible move
+                (default: {0})
+            max_epoch {int} -- a world is done once its epoch exceeds this
+                (default: {50})
+            seed {int} -- seed of the layout generator (default: {None})
+            observation {string} -- encoding of the observations: "grid",
+                "prox" or "vision", see KangGrid (default: {"grid"})
+            vision_distance {tuple} -- (x, y) distance seen by the "vision"
+                encoding (default: {(2, 2)})
+        """
+        if observation == "rgb":
+            raise Exception("KangGridVec has no rgb encoding!")
+        self.num_envs = num_envs
+        self.x_size = world_size[0]
+        self.y_size = world_size[1]
+        self.reward_map = np.array(reward_map)
+        self.collision_penalty = collision_penalty
+        self.max_epoch = max_epoch
+        self.np_random = np.random.default_rng(seed)
+
+        n_objects = len(reward_map)
+        self.representation = np.zeros((num_envs, self.y_size, self.x_size))
+        self.blocks = np.zeros(
+            (num_envs, self.y_size, self.x_size), dtype=bool)
+        self.items = ItemStore((num_envs, n_objects))
+        self.x_agent = np.zeros(num_envs, dtype=np.int64)
+        self.y_agent = np.zeros(num_envs, dtype=np.int64)
+        self.epoch = np.zeros(num_envs, dtype=np.int64)
+        self.prox_map = np.zeros((num_envs, n_objects, 3))
+        self.perm_contacts = np.zeros(
+            (num_envs, n_objects + 1, n_objects + 1))
+        self._grid_x = np.zeros_like(self.perm_contacts)
+        self._grid_y = np.zeros_like(self.perm_contacts)
+        self._worlds = np.arange(num_envs)
+        self._vision_pad = None
+        self._vision_padding = (0, 0)
+
+        self.observation = observation
+        self.vision_distance = tuple(vision_distance)
+        # the space of a single world's observations, see KangGrid
+        space = make_observer(observation, world_size, self.reward_map,
+                              vision_distance).space
+        shape = (num_envs,) + space.shape
+        self.observation_space = spaces.Box(
+            low=np.broadcast_to(space.low, shape),
+            high=np.broadcast_to(space.high, shape), dtype=space.dtype)
+        self.action_space = spaces.MultiDiscrete(
+            [len(self._ACTION_DEF)] * num_envs)
+
+    def _randomly_create_objects(self, worlds):
+        """Lay out fresh objects in the given worlds
+
+        The placements come from layouts.sample_layouts, like KangGrid's:
+        objects land on distinct cells, never on the origin.
+
+        Arguments:
+            worlds {array of int} -- indices of the worlds to lay out
+        """
+        n_objects = len(self.reward_map)
+        coordinates = layouts.sample_layouts(
+            self.np_random, len(worlds), (self.x_size, self.y_size),
+            n_objects)
+
+        self.items.reward[worlds] = self.reward_map
+        self.items.flags[worlds] = PASSABLE
+        self.items.x[worlds] = coordinates[:, :, 0]
+        self.items.y[worlds] = coordinates[:, :, 1]
+
+        self.representation[worlds] = 0
+        self.blocks[worlds] = False
+        rows = np.repeat(worlds, n_objects)
+        self.representation[rows, coordinates[:, :, 1].ravel(),
+                            coordinates[:, :, 0].ravel()] = np.tile(
+                                self.reward_map, len(worlds))
+        if self._vision_pad is not None:
+            x_pad, y_pad = self._vision_padding
+            self._vision_pad[worlds, y_pad:y_pad + self.y_size,
+                             x_pad:x_pad + self.x_size] = \
+                self.representation[worlds]
+
+    def _reset_worlds(self, worlds):
+        """Re-create the given worlds and place their agents at (0, 0)
+
+        Arguments:
+            worlds {array of int} -- indices of the worlds to reset
+        """
+        self._randomly_create_objects(worlds)
+        self.x_agent[worlds] = 0
+        self.y_agent[worlds] = 0
+        self.epoch[worlds] = 0
+        self.prox_map[worlds] = self.calculate_prox_map(
+            worlds, self.x_agent[worlds], self.y_agent[worlds])
+        (self._grid_x[worlds], self._grid_y[worlds],
+         self.perm_contacts[worlds]) = distance.object_blocks(
+            self.items.x[worlds], self.items.y[worlds])
+
+    def calculate_prox_map(self, worlds, x_target, y_target):
+        """Calculate the proximity maps of several worlds at once
+
+        Arguments:
+            worlds {array of int} -- indices of the worlds
+            x_target {array of int} -- agent x position of each world, clipped
+                to the grid; extra axes after the world axis (such as one
+                target per action) are kept in the output
+            y_target {array of int} -- agent y position of each world, clipped
+                to the grid
+
+        Returns:
+            matrix -- (len(worlds), ..., K, 3) of [Reward, x distance,
+            y distance]
+        """
+        items = self.items[worlds]
+        x_target = np.asarray(x_target)
+        # line the items up with the extra target axes
+        expand = (slice(None),) + (None,) * (x_target.ndim - 1)
+        dx = items.x[expand] - x_target[..., None]
+        dy = items.y[expand] - np.asarray(y_target)[..., None]
+
+        prox_map = np.empty(dx.shape + (3,))
+        # the float64 reward_map rather than the float32 items.reward
+        prox_map[..., 0] = np.where(items.consumed, 0,
+                                    self.reward_map)[expand]
+        prox_map[..., 1] = dx / float(self.x_size - 1)
+        prox_map[..., 2] = dy / float(self.y_size - 1)
+
+        # make hit items worth 0
+        prox_map[..., 0][(dx == 0) & (dy == 0)] = 0
+        return prox_map
+
+    def simulate_all_actions(self):
+        """One-step lookahead for every action in every world at once
+
+        Nothing is moved, consumed or reset, and only the returned arrays
+        are allocated.
+
+        Returns:
+            matrix, matrix, matrix -- (N, A, K, 3) proximity maps each world
+            would observe after each action, (N, A) rewards and (N, A)
+            whether each move collides; see Gridworld.simulate_all_actions
+        """
+        x_end = self.x_agent[:, None] + self._ACTION_DEF[:, 0]
+        y_end = self.y_agent[:, None] + self._ACTION_DEF[:, 1]
+        x_clip = np.clip(x_end, 0, self.x_size - 1)
+        y_clip = np.clip(y_end, 0, self.y_size - 1)
+        worlds = self._worlds[:, None]
+        collided = ((x_end != x_clip) | (y_end != y_clip) |
+                    self.blocks[worlds, y_clip, x_clip])
+        rewards = np.where(collided, float(self.collision_penalty),
+                           self.representation[worlds, y_clip, x_clip])
+        observations = self.calculate_prox_map(self._worlds, x_clip, y_clip)
+        return observations, rewards, collided
+
+    def calculate_grid_map(self):
+        """Calculate the distance + contact tensor of every world at once
+
+        Returns:
+            matrix -- (N, K + 1, K + 1, 3), see Gridworld.calculate_grid_map
+        """
+        return distance.grid_maps(
+            self.x_agent, self.y_agent, self.items.x,
+            self.items.y, self._grid_x, self._grid_y,
+            self.perm_contacts)
+
+    def return_vision(self, x_dist, y_dist):
+        """Return what the agent of every world can see
+
+        Arguments:
+            x_dist {int} -- distance the agents can see in the x direction
+            y_dist {int} -- distance the agents can see in the y direction
+
+        Returns:
+            matrix -- (N, 2 * y_dist + 1, 2 * x_dist + 1), see
+            Gridworld.return_vision
+        """
+        self._vision_pad, self._vision_padding = vision.ensure_padding(
+            self._vision_pad, self._vision_padding, self.representation,
+            x_dist, y_dist)
+        return vision.extract_windows(
+            self._vision_pad, self._vision_padding, self.x_agent,
+            self.y_agent, x_dist, y_dist)
+
+    def _observe(self, worlds):
+        """Return the observations of some worlds, see KangGrid.step
+
+        Arguments:
+            worlds {array of int} -- indices of the worlds
+
+        Returns:
+            matrix -- (len(worlds), ...) new array of observations
+        """
+        if self.observation == "prox":
+            return self.prox_map[worlds]
+        if self.observation == "vision":
+            x_dist, y_dist = self.vision_distance
+            self._vision_pad, self._vision_padding = vision.ensure_padding(
+                self._vision_pad, self._vision_padding, self.representation,
+                x_dist, y_dist)
+            return vision.extract_windows(
+                self._vision_pad, self._vision_padding, self.x_agent[worlds],
+                self.y_agent[worlds], x_dist, y_dist, worlds)
+        return distance.grid_maps(
+            self.x_agent[worlds], self.y_agent[worlds], self.items.x[worlds],
+            self.items.y[worlds], self._grid_x[worlds], self._grid_y[worlds],
+            self.perm_contacts[worlds])
+
+    def reset(self):
+        """Re-create every world
+
+        Returns:
+            matrix -- (N, ...) batch of observations
+        """
+        self._reset_worlds(self._worlds)
+        return self._observe(self._worlds)
+
+    def step(self, actions):
+        """Apply one action in every world
+
+        A world is done when its agent collects a reward of 1 or its epoch
+        exceeds max_epoch, exactly like KangGrid.step. Done worlds are reset
+        before returning, so their observation is the first one of the next
+        episode; the last observation of the finished episode is kept in
+        info["terminal_observation"].
+
+        Arguments:
+            actions {array of int} -- one action index per world
+
+        Returns:
+            matrix, array, array, dict -- observations, rewards, dones, info
+        """
+        effects = self._ACTION_DEF[np.asarray(actions)]
+        x_end = self.x_agent + effects[:, 0]
+        y_end = self.y_agent + effects[:, 1]
+        x_clip = np.clip(x_end, 0, self.x_size - 1)
+        y_clip = np.clip(y_end, 0, self.y_size - 1)
+
+        # the proximity map is updated before the move, as in move_agent
+        self.prox_map[:] = self.calculate_prox_map(
+            self._worlds, x_clip, y_clip)
+        self.epoch += 1
+
+        possible = ((x_end == x_clip) & (y_end == y_clip) &
+                    ~self.blocks[self._worlds, y_clip, x_clip])
+        self.x_agent[possible] = x_end[possible]
+        self.y_agent[possible] = y_end[possible]
+
+        rewards = np.full(self.num_envs, self.collision_penalty, dtype=float)
+        moved = self._worlds[possible]
+        cells = (moved, self.y_agent[moved], self.x_agent[moved])
+        rewards[moved] = self.representation[cells]
+        # clear item
+        self.representation[cells] = 0
+        if self._vision_pad is not None:
+            self._vision_pad[moved, cells[1] + self._vision_padding[1],
+                             cells[2] + self._vision_padding[0]] = 0
+        consumed = ((self.items.x[moved] == self.x_agent[moved, None]) &
+                    (self.items.y[moved] == self.y_agent[moved, None]))
+        hit_worlds, hit_items = np.nonzero(consumed)
+        self.items.consume((moved[hit_worlds], hit_items))
+        # consumed objects are always considered contacting
+        contacts = self.perm_contacts[moved]
+        contacts[:, 1:, 0][consumed] = 1
+        self.perm_contacts[moved] = contacts
+
+        dones = (rewards == 1) | (self.epoch > self.max_epoch)
+        observations = self._observe(self._worlds)
+        info = {}
+        if dones.any():
+            info["terminal_observation"] = observations.copy()
+            finished = self._worlds[dones]
+            self._reset_worlds(finished)
+            observations[finished] = self._observe(finished)
+
+        return observations, rewards, dones, info
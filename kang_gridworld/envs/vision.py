@@ -0,0 +1,78 @@
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def pad_representation(representation, x_dist, y_dist):
+    """Surround one or more representations with -inf
+
+    Arguments:
+        representation {matrix} -- (..., ySize, xSize) reward values
+        x_dist {int} -- padding added left and right
+        y_dist {int} -- padding added above and below
+
+    Returns:
+        matrix -- (..., ySize + 2 * y_dist, xSize + 2 * x_dist) padded copy
+    """
+    padding = [(0, 0)] * (representation.ndim - 2)
+    padding += [(y_dist, y_dist), (x_dist, x_dist)]
+    return np.pad(representation, padding, constant_values=-np.inf)
+
+
+def ensure_padding(pad, padding, representation, x_dist, y_dist):
+    """Return a padded representation with room for the given distances
+
+    The padded copy is kept while its padding is large enough; otherwise
+    it is rebuilt with the padding grown to cover both the old and the new
+    distances.
+
+    Arguments:
+        pad {matrix} -- current padded representation, or None
+        padding {(int, int)} -- (x, y) padding of pad
+        representation {matrix} -- (..., ySize, xSize) reward values
+        x_dist {int} -- distance seen in the x direction
+        y_dist {int} -- distance seen in the y direction
+
+    Returns:
+        matrix, (int, int) -- padded representation and its (x, y) padding
+    """
+    if pad is not None and x_dist <= padding[0] and y_dist <= padding[1]:
+        return pad, padding
+    padding = (max(x_dist, padding[0]), max(y_dist, padding[1]))
+    return pad_representation(representation, *padding), padding
+
+
+def extract_windows(padded, padding, x_agents, y_agents, x_dist, y_dist,
+                    worlds=None):
+    """Cut the vision windows of many agents out of padded representations
+
+    The windows are gathered from a sliding_window_view of the padded
+    array, so no per-agent Python work is done.
+
+    Arguments:
+        padded {matrix} -- (N, Y, X) padded representations, or a single
+            (Y, X) one shared by all agents
+        padding {(int, int)} -- (x, y) padding of the padded array, at least
+            (x_dist, y_dist)
+        x_agents {array of int} -- (M,) agent x coordinates
+        y_agents {array of int} -- (M,) agent y coordinates
+        x_dist {int} -- distance the agents can see in the x direction
+        y_dist {int} -- distance the agents can see in the y direction
+
+    Keyword Arguments:
+        worlds {array of int} -- (M,) world of each agent; defaults to agent
+            i living in world i (default: {None})
+
+    Returns:
+        matrix -- (M, 2 * y_dist + 1, 2 * x_dist + 1) windows, -inf outside
+        the grid
+    """
+    windows = sliding_window_view(
+        padded, (2 * y_dist + 1, 2 * x_dist + 1), axis=(-2, -1))
+    rows = np.asarray(y_agents) + padding[1] - y_dist
+    columns = np.asarray(x_agents) + padding[0] - x_dist
+    if padded.ndim == 2:
+        return windows[rows, columns]
+    if worlds is None:
+        worlds = np.arange(len(rows))
+    return windows[worlds, rows, columns]
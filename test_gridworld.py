@@ -3,12 +3,40 @@
 # from gym import envs
 # print(envs.registry.all())
 
+import copy
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
 import gym
 import kang_gridworld
 import numpy as np
 
+from kang_gridworld.envs import (KangGrid, KangGridVec, PhaseTimer,
+                                 StepRecorder)
+from kang_gridworld.envs.async_vector import AsyncKangGridVec
+from kang_gridworld.envs.gridworld import Gridworld
+from kang_gridworld.envs.items import ItemStore
+from kang_gridworld.envs.layouts import LayoutQueue, sample_layouts
+from kang_gridworld.envs.multi_agent import MultiAgentGridworld
+from kang_gridworld.envs.observations import make_observer
+from kang_gridworld.envs.planning import TabularModel, solve_layouts
+from kang_gridworld.envs.profiling import profile_steps
+from kang_gridworld.envs.recording import FrameRecorder
+from kang_gridworld.envs.replay import ReplayDataset, ReplayRecorder
+from kang_gridworld.envs.storage import LayoutBank, write_bank
+
 # Remember: up/left/down/right corresponds to (0, 1, 2, 3)
 
+# 5 x 5 layout with a blocking object at (2, 2), rows of form
+# [reward, passable, xCoord, yCoord]
+OBJECTS = [[1, True, 3, 2], [-1, True, 0, 4], [5, False, 2, 2],
+           [2, True, 4, 4], [-3, True, 1, 1]]
+
 
 def test_1_env_creation():
     # Goal: check that an environment is created and stored
@@ -30,7 +58,6 @@ def test_3_object_generation():
     # 1. Do not overlap
     # 2. Do not start at the origin
     # 3. Are within the grid
-
     # Note: this test is stochastic
     for _ in range(10):
         env = gym.make('kang-grid-v0')
@@ -39,16 +66,13 @@ def test_3_object_generation():
 
         objects = env.env.env._get_objects()
 
-        cherry = objects[0]
-        bomb = objects[1]
-
-        _, _, cherryX, cherryY = cherry
-        _, _, bombX, bombY = bomb
+        cherryX, cherryY = objects.x[0], objects.y[0]
+        bombX, bombY = objects.x[1], objects.y[1]
 
-        assert isinstance(cherryX, np.int64), "CherryX is not an int"
-        assert isinstance(cherryY, np.int64), "CherryX is not an int"
-        assert isinstance(bombX, np.int64), "CherryX is not an int"
-        assert isinstance(bombY, np.int64), "CherryX is not an int"
+        assert isinstance(cherryX, np.integer), "CherryX is not an int"
+        assert isinstance(cherryY, np.integer), "CherryX is not an int"
+        assert isinstance(bombX, np.integer), "CherryX is not an int"
+        assert isinstance(bombY, np.integer), "CherryX is not an int"
 
         assert cherryX != bombX or cherryY != bombY, "Cherry and bomb coexist"
         assert cherryX != 0 or cherryY != 0, "Cherry at origin"
@@ -63,6 +87,7 @@ def test_3_object_generation():
 def test_4_movement():
     # Goal: check that the agent can move correctly (in unimpeded situations)
     env = gym.make('kang-grid-v0')
+    env.reset()
 
     env.step(3)
     assert env.env.env._get_agent_coords() == (1, 0), "Agent did not move right"
@@ -80,6 +105,7 @@ def test_4_movement():
 def test_5_boundaries():
     # Goal: ensure collisions with the edge do not cause the agent to go over
     env = gym.make('kang-grid-v0')
+    env.reset()
 
     for _ in range(6):
         env.step(3)
@@ -105,6 +131,7 @@ def test_5_boundaries():
 def test_6_epoch_count():
     # Goal: ensure the epoch counter is correct
     env = gym.make('kang-grid-v0')
+    env.reset()
     for i in range(50):
         assert env.env._get_epoch() == i, "Count does not match"
         env.step(0)
@@ -112,8 +139,10 @@ def test_6_epoch_count():
 
 def test_7_env_output():
     env = gym.make('kang-grid-v0')
+    env.reset()
     state, _, _, _ = env.step(0)
-    assert state.shape == (5, 5, 2), "Output does not match expected shape"
+    assert state.shape == (3, 3, 3), "Output does not match expected shape"
+    assert env.observation_space.contains(state), "Output not in space"
 
 
 def test_8_contact_map():
@@ -128,11 +157,8 @@ def test_8_contact_map():
 
         contacts = env.env.env.calculate_grid_map()[:, :, 2]
 
-        cherry = objects[0]
-        bomb = objects[1]
-
-        _, _, cherryX, cherryY = cherry
-        _, _, bombX, bombY = bomb
+        cherryX, cherryY = objects.x[0], objects.y[0]
+        bombX, bombY = objects.x[1], objects.y[1]
 
         def is_contacting(x1, y1, x2, y2):
             if (abs(x1-x2) + abs(y1-y2) <= 1):
@@ -154,3 +180,1070 @@ def test_8_contact_map():
             assert contacts[2][1] == 1, "The bomb/cherry pair is not marked"
         else:
             assert contacts[2][1] == 0, "The bomb/cherry pair is marked"
+
+
+def test_9_vector_env_matches_gridworld():
+    # Goal: every world of the batched env follows single-env semantics,
+    # and observes what a KangGrid with the same encoding would
+
+    def make_worlds(vec_env):
+        worlds = []
+        for world in range(vec_env.num_envs):
+            grid = Gridworld((5, 5), KangGrid._ACTION_INFO,
+                             [vec_env.items[world], 0])
+            grid.place_agent(0, 0)
+            worlds.append(grid)
+        return worlds
+
+    assert KangGridVec(2).observation_space.shape == \
+        (2,) + KangGrid().observation_space.shape, "Default differs"
+    rng = np.random.default_rng(1)
+    for encoding in ("grid", "prox", "vision"):
+        vec_env = KangGridVec(64, seed=0, observation=encoding,
+                              vision_distance=(2, 1))
+        observer = make_observer(encoding, (5, 5), (1, -1), (2, 1))
+        assert vec_env.observation_space.shape == \
+            (64,) + observer.space.shape
+        obs = vec_env.reset()
+        worlds = make_worlds(vec_env)
+        for world, world_obs in zip(worlds, obs):
+            assert np.array_equal(observer.observe(world), world_obs), \
+                "Reset differs"
+
+        for _ in range(100):
+            actions = rng.integers(0, 4, size=64)
+            obs, rewards, dones, info = vec_env.step(actions)
+            for index, world in enumerate(worlds):
+                reward = world.move_agent(actions[index])
+                assert rewards[index] == reward, "Reward differs"
+                done = reward == 1 or world._get_epoch() > 50
+                assert dones[index] == done, "Done differs"
+                if done:
+                    final_obs = info["terminal_observation"][index]
+                else:
+                    final_obs = obs[index]
+                assert np.array_equal(observer.observe(world), final_obs), \
+                    "Obs differs"
+                if not done:
+                    assert np.array_equal(
+                        world.calculate_grid_map(),
+                        vec_env.calculate_grid_map()[index]), \
+                        "Grid map differs"
+                    assert (vec_env.x_agent[index],
+                            vec_env.y_agent[index]) == \
+                        world._get_agent_coords(), "Position differs"
+            if dones.any():
+                fresh = make_worlds(vec_env)
+                for index in np.flatnonzero(dones):
+                    worlds[index] = fresh[index]
+                    assert np.array_equal(
+                        observer.observe(worlds[index]), obs[index])
+
+
+def test_10_step_recorder():
+    # Goal: the telemetry ring buffer keeps the newest steps and counts all
+    env = gym.make('kang-grid-v0')
+    assert env.env.telemetry is None, "Telemetry should be off by default"
+
+    recorder = StepRecorder(capacity=4)
+    env.env.set_telemetry(recorder)
+    assert env.env.telemetry is recorder, "Hook not installed"
+
+    for step in range(6):
+        recorder(step + 1, step % 4, (step, 0), -1 if step == 5 else 0,
+                 step == 5, step % 2 == 0)
+
+    records = recorder.records()
+    assert list(records["epoch"]) == [3, 4, 5, 6], "Oldest steps not dropped"
+    assert records["position"][-1].tolist() == [5, 0], "Position not kept"
+
+    stats = recorder.stats()
+    assert stats["steps"] == 6, "Steps not counted"
+    assert stats["episodes"] == 1, "Episodes not counted"
+    assert stats["mean_episode_length"] == 6, "Episode length is wrong"
+    assert stats["collision_rate"] == 0.5, "Collision rate is wrong"
+
+    # episodes cut short by the TimeLimit of gym.make end on reset
+    recorder.clear()
+    lengths = []
+    rng = np.random.default_rng(2)
+    for _ in range(5):
+        env.reset()
+        done, length = False, 0
+        while not done:
+            _, _, done, _ = env.step(int(rng.integers(0, 4)))
+            length += 1
+        lengths.append(length)
+    env.reset()
+    stats = recorder.stats()
+    assert stats["episodes"] == 5, "Time-limited episodes not counted"
+    assert stats["mean_episode_length"] == np.mean(lengths)
+
+
+def test_11_incremental_prox_map():
+    # Goal: the incrementally updated proximity map stays bit-identical to
+    # a full recomputation, including speculative lookups
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [OBJECTS, 0])
+        grid.place_agent(1, 1)
+        for _ in range(60):
+            action = rng.integers(0, 4)
+            effect = KangGrid._ACTION_DEF[action]
+            expected = grid.calculate_prox_map(effect)
+            speculated = grid.update_proximity_map(effect, speculative=True)
+            assert np.array_equal(speculated, expected), "Speculation differs"
+
+            grid.move_agent(action)
+            assert np.array_equal(grid.prox_map, expected), "Update differs"
+
+
+def test_12_grid_map():
+    # Goal: the cached distance / contact tensor matches a direct computation
+    objects = [[1, True, 3, 2], [-1, True, 3, 3], [2, True, 0, 4]]
+    grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, 0])
+    grid.place_agent(2, 2)
+
+    grid_map = grid.calculate_grid_map()
+    positions = [(2, 2), (3, 2), (3, 3), (0, 4)]
+    for target in range(4):
+        for source in range(target):
+            delta_x = positions[source][0] - positions[target][0]
+            delta_y = positions[source][1] - positions[target][1]
+            touching = abs(delta_x) + abs(delta_y) <= 1
+            assert grid_map[target, source, 0] == delta_x, "X map is wrong"
+            assert grid_map[target, source, 1] == delta_y, "Y map is wrong"
+            assert grid_map[target, source, 2] == touching, "Contact is wrong"
+    assert grid_map[0, 0, :2].tolist() == [2, 2], "Agent not on diagonal"
+    assert grid_map[3, 3, :2].tolist() == [0, 4], "Object not on diagonal"
+
+    # a consumed object stays in contact once the agent walks away
+    grid.move_agent(3)
+    grid.move_agent(1)
+    grid.move_agent(1)
+    assert grid.calculate_grid_map()[1, 0, 2] == 1, "Consumed not contacting"
+    assert grid.calculate_grid_map()[3, 0, 2] == 0, "Far object contacting"
+
+    # the object part is only built when first needed, and then picks up
+    # the objects consumed in the meantime
+    grid.reset_layout(objects)
+    grid.place_agent(2, 2)
+    state = grid.get_state()
+    grid.move_agent(3)
+    grid.move_agent(1)
+    grid.move_agent(1)
+    assert grid._blocks_pending, "Object part built without a grid map"
+    assert grid.calculate_grid_map()[1, 0, 2] == 1, "Consumed not contacting"
+    grid.set_state(state)
+    assert grid.perm_contacts[1, 0] == 0, "Restored object contacting"
+    assert np.array_equal(grid.calculate_grid_map(), grid_map), \
+        "Restored grid map differs"
+
+
+def test_13_compiled_dynamics():
+    # Goal: compiled worlds follow the same trajectories as plain worlds,
+    # and loading a new layout rebuilds the tables
+    plain = Gridworld((5, 5), KangGrid._ACTION_INFO, [OBJECTS, -2])
+    compiled = Gridworld((5, 5), KangGrid._ACTION_INFO, [OBJECTS, -2],
+                         compiled=True)
+    plain.place_agent(0, 0)
+    compiled.place_agent(0, 0)
+
+    rng = np.random.default_rng(5)
+    for _ in range(300):
+        action = rng.integers(0, 4)
+        assert plain.move_agent(action) == compiled.move_agent(action)
+        assert plain._get_agent_coords() == compiled._get_agent_coords()
+        assert np.array_equal(plain.prox_map, compiled.prox_map)
+        assert np.array_equal(plain.item_list, compiled.item_list)
+    assert plain._get_epoch() == compiled._get_epoch()
+
+    with tempfile.NamedTemporaryFile(suffix=".npz") as world_file:
+        Gridworld((5, 5), KangGrid._ACTION_INFO,
+                  [[[1, False, 1, 0]], 0]).save_world(world_file)
+        world_file.flush()
+        compiled.load_world(world_file.name)
+    compiled.x_agent, compiled.y_agent = 0, 0
+    assert compiled.move_agent(3) == 0, "Stale tables let agent into block"
+    assert compiled._get_agent_coords() == (0, 0), "Agent entered block"
+
+    # KangGrid passes compiled through to every layout
+    plain_env = gym.make('kang-grid-v0', seed=3)
+    compiled_env = gym.make('kang-grid-v0', seed=3, compiled=True)
+    plain_env.reset()
+    compiled_env.reset()
+    assert compiled_env.unwrapped.env.compiled
+    for action in np.random.default_rng(3).integers(0, 4, 40):
+        expected = plain_env.step(action)
+        result = compiled_env.step(action)
+        assert np.array_equal(expected[0], result[0])
+        assert expected[1:3] == result[1:3]
+        if expected[2]:
+            break
+
+
+def test_14_representation_palette():
+    # Goal: the palette lookup matches per-cell colouring, reuses buffers
+    # and offers a uint8 image
+    objects = [[1, True, 3, 2], [-1, True, 0, 4], [2, True, 4, 4]]
+    grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, 0])
+    grid.place_agent(1, 1)
+
+    expected = np.zeros((5, 5, 3))
+    expected[2, 3] = [1, 0, 0]
+    expected[4, 0] = [0, 0, 1]
+    expected[1, 1] = [1, 1, 1]
+    assert np.array_equal(grid.get_representation(showAgent=True), expected)
+
+    buffer = np.zeros((5, 5, 3), dtype=np.uint8)
+    image = grid.get_representation(showAgent=True, out=buffer,
+                                    dtype=np.uint8)
+    assert image is buffer, "Buffer not reused"
+    assert np.array_equal(image, (expected * 255).astype(np.uint8))
+
+    image = grid.get_representation(cherry_color="00FF00")
+    assert image[2, 3].tolist() == [0, 1, 0], "Custom colour not used"
+
+
+def test_15_vision():
+    # Goal: vision windows match a per-cell reference, follow consumption,
+    # and the batched extraction agrees with the single-world one
+
+    def reference(grid, x_dist, y_dist):
+        output = np.full((2 * y_dist + 1, 2 * x_dist + 1), -np.inf)
+        for dy in range(-y_dist, y_dist + 1):
+            for dx in range(-x_dist, x_dist + 1):
+                x_pos, y_pos = grid.x_agent + dx, grid.y_agent + dy
+                if 0 <= x_pos < grid.x_size and 0 <= y_pos < grid.y_size:
+                    output[dy + y_dist, dx + x_dist] = \
+                        grid.representation[y_pos, x_pos]
+        return output
+
+    objects = [[1, True, 3, 2], [-1, True, 0, 4], [2, True, 4, 4]]
+    grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, 0])
+    grid.place_agent(2, 2)
+    rng = np.random.default_rng(7)
+    for step in range(100):
+        x_dist, y_dist = (1, 2) if step % 2 else (3, 1)
+        assert np.array_equal(grid.return_vision(x_dist, y_dist),
+                              reference(grid, x_dist, y_dist))
+        grid.move_agent(rng.integers(0, 4))
+
+    vec_env = KangGridVec(16, seed=2)
+    vec_env.reset()
+    for _ in range(30):
+        vec_env.step(rng.integers(0, 4, size=16))
+        windows = vec_env.return_vision(2, 1)
+        for index in range(16):
+            world = SimpleNamespace(
+                representation=vec_env.representation[index],
+                x_agent=vec_env.x_agent[index],
+                y_agent=vec_env.y_agent[index], x_size=5, y_size=5)
+            assert np.array_equal(windows[index], reference(world, 2, 1))
+
+
+def test_16_async_vector_env():
+    # Goal: the process-pool env reproduces per-worker seeded KangGridVecs
+    env = AsyncKangGridVec(6, num_workers=2, seed=11)
+    try:
+        seeds = np.random.SeedSequence(11).spawn(2)
+        references = [KangGridVec(3, seed=seed) for seed in seeds]
+        observations = env.reset()
+        expected = np.concatenate([ref.reset() for ref in references])
+        assert np.array_equal(observations, expected), "Reset differs"
+
+        rng = np.random.default_rng(0)
+        episodes = 0
+        for _ in range(80):
+            actions = rng.integers(0, 4, size=6)
+            env.step_async(actions)
+            observations, rewards, dones, info = env.step_wait()
+            results = [ref.step(actions[3 * index:3 * index + 3])
+                       for index, ref in enumerate(references)]
+            for position, values in enumerate((observations, rewards, dones)):
+                assert np.array_equal(values, np.concatenate(
+                    [result[position] for result in results]))
+            assert ("terminal_observation" in info) == dones.any()
+            if dones.any():
+                episodes += 1
+                assert np.array_equal(
+                    info["terminal_observation"], np.concatenate(
+                        [result[3].get("terminal_observation", result[0])
+                         for result in results]))
+        assert episodes, "No episode ended"
+    finally:
+        env.close()
+
+
+def test_17_seeded_layouts():
+    # Goal: seeded envs generate the same layouts, and bulk sampled layouts
+    # land on distinct cells, never on the origin
+    first, second = KangGrid(seed=4), KangGrid(seed=4)
+    assert np.array_equal(first._get_objects(), second._get_objects())
+    for _ in range(10):
+        assert np.array_equal(first._layouts.pop(), second._layouts.pop())
+
+    first.seed(9)
+    grid = first.env
+    grid.reset_layout(first._layouts.pop())
+    grid.place_agent(0, 0)
+    assert first.env is grid, "Gridworld was rebuilt"
+    assert grid._get_epoch() == 0, "Epoch not reset"
+    assert np.array_equal(grid._get_objects(),
+                          KangGrid(seed=9)._get_objects())
+
+    layouts = sample_layouts(np.random.default_rng(0), 20000, (5, 5), 2)
+    cells = layouts[:, :, 1] * 5 + layouts[:, :, 0]
+    assert (cells > 0).all(), "Object at origin"
+    assert (cells[:, 0] != cells[:, 1]).all(), "Objects overlap"
+    for item in range(2):
+        counts = np.bincount(cells[:, item], minlength=25)[1:]
+        assert counts.min() > 600 and counts.max() < 1100, "Not uniform"
+
+    # many objects in a large world redraw only the clashing objects
+    layouts = sample_layouts(np.random.default_rng(1), 3, (1024, 1024), 1100)
+    for layout in layouts:
+        cells = layout[:, 1] * 1024 + layout[:, 0]
+        assert len(np.unique(cells)) == 1100 and cells.min() > 0
+
+
+def test_18_in_place_reset_allocations():
+    # Goal: resetting and stepping reuse the world's buffers and neither
+    # retain nor transiently allocate anything the size of the grid
+    queue = LayoutQueue(np.random.default_rng(0), (64, 64), [1, -1] * 4,
+                        chunk_size=256)
+    for compiled in (False, True):
+        grid = Gridworld((64, 64), KangGrid._ACTION_INFO,
+                         [queue.pop(), 0], compiled=compiled)
+        grid.place_agent(0, 0)
+        grid.return_vision(2, 2)
+        buffers = [grid.representation, grid.blocks, grid.items.x,
+                   grid.prox_map, grid.perm_contacts, grid._vision_pad]
+        actions = np.random.default_rng(1).integers(0, 4, 64).tolist()
+
+        def run(episodes):
+            for _ in range(episodes):
+                grid.reset_layout(queue.pop())
+                grid.place_agent(0, 0)
+                for action in actions:
+                    grid.move_agent(action)
+                    grid.prox_map
+
+        run(5)
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        run(100)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert after - before < 1024, "Reset/step retained memory"
+        assert peak - before < grid.representation.nbytes // 4, \
+            "Reset/step allocated a grid-sized buffer"
+        assert all(old is new for old, new in zip(buffers, [
+            grid.representation, grid.blocks, grid.items.x,
+            grid.prox_map, grid.perm_contacts, grid._vision_pad])), \
+            "Buffers were reallocated"
+
+
+def test_19_configurable_world():
+    # Goal: size, object count and rewards are configurable through
+    # gym.make, the observation space follows them, and non-square worlds
+    # index cells correctly
+    env = gym.make('kang-grid-v0', world_size=(40, 24), reward_map=[1, -1],
+                   number_of_objects=50, seed=0)
+    grid = env.env.env
+    assert grid.representation.shape == (24, 40), "Grid shape is wrong"
+    assert env.observation_space.shape == (51, 51, 3), "Space is wrong"
+
+    objects = grid._get_objects()
+    assert len(objects) == 50, "Wrong number of objects"
+    assert list(objects.reward[:4]) == [1, -1, 1, -1], "Rewards not repeated"
+    assert (objects.x < 40).all() and (objects.y < 24).all()
+    assert len(set(zip(objects.x, objects.y))) == 50, "Overlap"
+
+    # walk the agent to an object and check it is consumed
+    reward, x_item, y_item = objects.reward[7], objects.x[7], objects.y[7]
+    grid.x_agent, grid.y_agent = x_item - 1 if x_item else 1, y_item
+    action = 3 if x_item else 1
+    assert grid.move_agent(action) == reward, "Object not collected"
+    assert grid.representation[y_item, x_item] == 0, "Cell not cleared"
+    assert objects.reward[7] == 0, "Object not consumed"
+    assert objects.consumed[7], "Object not flagged as consumed"
+    assert (objects.reward[:7] != 0).all(), "Other objects consumed"
+
+
+def test_20_item_index():
+    # Goal: cell and nearest-item queries agree with a brute-force scan,
+    # also after items are consumed
+    env = gym.make('kang-grid-v0', world_size=(60, 45), number_of_objects=80,
+                   seed=3)
+    grid = env.env.env
+    objects = grid._get_objects()
+    live = np.ones(len(objects), dtype=bool)
+    rng = np.random.default_rng(0)
+
+    for step in range(200):
+        if step % 5 == 0:
+            index = rng.choice(np.flatnonzero(live))
+            grid.x_agent = objects.x[index] - 1
+            grid.y_agent = objects.y[index]
+            if grid.x_agent < 0:
+                continue
+            grid.move_agent(3)
+            live[index] = False
+
+        x_coord, y_coord = rng.integers(0, 60), rng.integers(0, 45)
+        on_cell = np.flatnonzero(live & (objects.x == x_coord) &
+                                 (objects.y == y_coord))
+        expected = on_cell[0] if len(on_cell) else -1
+        assert grid.item_at(x_coord, y_coord) == expected, "Wrong cell item"
+
+        distances = (np.abs(objects.x - x_coord) +
+                     np.abs(objects.y - y_coord))
+        distances[~live] = 10 ** 6
+        assert grid.nearest_item(x_coord, y_coord) == (
+            distances.argmin(), distances.min()), "Wrong nearest item"
+
+    x_coord, y_coord = objects.x[live][0], objects.y[live][0]
+    assert grid.item_at(x_coord, y_coord) == np.flatnonzero(live)[0]
+
+
+def test_21_item_store():
+    # Goal: the typed item store round-trips the row format, stays at 9
+    # bytes per item and flags consumed items in single and batched worlds
+    rows = [[1, True, 3, 2], [-1, True, 0, 4], [5, False, 2, 2]]
+    items = ItemStore.from_rows(rows)
+    assert np.array_equal(items.as_matrix(), rows), "Rows changed"
+    assert list(items.passable) == [True, True, False]
+    assert items.nbytes == 9 * len(rows), "Items are not compact"
+    items.consume(1)
+    assert items.reward[1] == 0 and list(items.consumed) == [0, 1, 0]
+
+    vec_env = KangGridVec(256, seed=2)
+    vec_env.reset()
+    assert vec_env.items.shape == (256, 2)
+    assert vec_env.items.nbytes == 9 * 2 * 256
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        before = vec_env.items.reward.copy()
+        _, rewards, dones, _ = vec_env.step(rng.integers(0, 4, size=256))
+        eaten = (rewards != 0) & ~dones
+        assert (vec_env.items.reward[eaten] != before[eaten]).any(axis=1).all()
+        assert vec_env.items.consumed[eaten].any(axis=1).all()
+
+
+def test_22_simulate_all_actions():
+    # Goal: the lookahead of every action matches actually taking it, and
+    # leaves the world untouched
+    rng = np.random.default_rng(6)
+    for compiled in (False, True):
+        grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [OBJECTS, -2],
+                         compiled=compiled)
+        grid.place_agent(0, 0)
+        for _ in range(100):
+            before = copy.deepcopy(grid)
+            observations, rewards, collided = grid.simulate_all_actions()
+            assert grid._get_epoch() == before._get_epoch()
+            assert np.array_equal(grid.prox_map, before.prox_map)
+            assert np.array_equal(grid.representation, before.representation)
+            for action in range(4):
+                world = copy.deepcopy(before)
+                reward = world.move_agent(action)
+                assert rewards[action] == reward, "Wrong reward"
+                assert collided[action] == (
+                    world._get_agent_coords() == before._get_agent_coords())
+                assert np.array_equal(observations[action], world.prox_map)
+            grid.move_agent(rng.integers(0, 4))
+
+    vec_env = KangGridVec(32, collision_penalty=-2, seed=7,
+                          observation="prox")
+    vec_env.reset()
+    for _ in range(30):
+        observations, rewards, collided = vec_env.simulate_all_actions()
+        for action in range(4):
+            world = copy.deepcopy(vec_env)
+            positions = (world.x_agent.copy(), world.y_agent.copy())
+            obs, reward, dones, info = world.step(np.full(32, action))
+            obs = info.get("terminal_observation", obs)
+            assert np.array_equal(observations[:, action], obs)
+            assert np.array_equal(rewards[:, action], reward)
+            # rewards are +-1, so only collisions score the penalty
+            assert np.array_equal(collided[:, action], reward == -2)
+            moved = ((positions[0] != world.x_agent) |
+                     (positions[1] != world.y_agent))
+            assert np.array_equal(collided[:, action][~dones],
+                                  ~moved[~dones]), "Wrong collisions"
+        vec_env.step(rng.integers(0, 4, size=32))
+
+
+def test_23_tabular_planning():
+    # Goal: the solver's values match exhaustive search through move_agent,
+    # its policy achieves them, and batches agree with single layouts
+
+    def search(grid, horizon):
+        if horizon == 0:
+            return 0
+        best = -np.inf
+        for action in range(4):
+            world = copy.deepcopy(grid)
+            reward = world.move_agent(action)
+            if reward != 1:
+                reward += search(world, horizon - 1)
+            best = max(best, reward)
+        return best
+
+    objects = [[1, True, 3, 2], [-1, True, 1, 0], [5, False, 2, 2],
+               [2, True, 0, 2], [-3, True, 1, 1]]
+    grid = Gridworld((4, 3), KangGrid._ACTION_INFO, [objects, -2])
+    grid.place_agent(0, 0)
+    grid.move_agent(3)
+    model = TabularModel.from_gridworld(grid)
+    start = model.state_index(grid.x_agent, grid.y_agent,
+                              grid.items.consumed)
+    for horizon in range(6):
+        values, _ = model.solve(horizon)
+        assert values[0, start] == search(grid, horizon), "Wrong value"
+
+    values, policy = model.solve(20)
+    total = 0
+    for steps_left in range(20, 0, -1):
+        state = model.state_index(grid.x_agent, grid.y_agent,
+                                  grid.items.consumed)
+        reward = grid.move_agent(policy[0, steps_left - 1, state])
+        total += reward
+        if reward == 1:
+            break
+    assert total == values[0, start], "Policy does not reach its value"
+
+    items, returns = solve_layouts(np.random.default_rng(8), 64, (5, 4),
+                                   [1, -1, 2])
+    for index in range(0, 64, 9):
+        single = TabularModel(items[index:index + 1], (5, 4),
+                              KangGrid._ACTION_DEF)
+        assert single.solve()[0][0, 0] == returns[index], "Batch differs"
+
+    # the model pays exactly what the env pays
+    grid = Gridworld((3, 2), KangGrid._ACTION_INFO,
+                     [[[0.1, True, 1, 0]], 0])
+    grid.place_agent(0, 0)
+    assert TabularModel.from_gridworld(grid).solve(3)[0][0, 0] == 0.1
+    _, returns = solve_layouts(np.random.default_rng(0), 4, (3, 2), [0.1])
+    assert (returns == 0.1).all(), "Rewards not exact"
+
+
+def test_24_phase_timer():
+    # Goal: an installed timer counts the timed phases, and removing it
+    # stops all timing
+    env = KangGrid(seed=0)
+    grid = env.env
+    assert env.stats() == {}, "Stats without a profiler"
+
+    timer = PhaseTimer()
+    env.set_profiler(timer)
+    assert grid.profiler is timer, "Timer not shared with the Gridworld"
+    for action in [3, 2, 1, 0] * 5:
+        grid.move_agent(action)
+        grid.prox_map
+    stats = env.stats()
+    assert stats["prox_map"]["calls"] == 20, "Sync not timed"
+    assert stats["prox_map"]["total_ms"] > 0
+
+    profile, stats = profile_steps(gym.make('kang-grid-v0'), 200)
+    assert stats["step"]["calls"] == 200, "Steps not timed"
+    assert {"move_agent", "observation", "reset", "wrapper"} <= set(stats)
+    assert profile.total_calls > 0, "Nothing profiled"
+
+    env.set_profiler(None)
+    grid.move_agent(3)
+    grid.prox_map
+    assert timer.calls["prox_map"] == 20, "Timed while disabled"
+    timer.clear()
+    assert timer.stats() == {}
+
+
+def test_25_observation_encodings():
+    # Goal: every encoding matches the world it observes across steps and
+    # resets, fits its space, and is updated in place
+    expected = {
+        "grid": lambda grid: grid.calculate_grid_map(),
+        "prox": lambda grid: grid.prox_map,
+        "vision": lambda grid: grid.return_vision(1, 2),
+        "rgb": lambda grid: grid.get_representation(True, dtype=np.uint8),
+    }
+    rng = np.random.default_rng(4)
+    for encoding, reference in expected.items():
+        env = KangGrid(seed=5, world_size=(7, 6), number_of_objects=6,
+                       observation=encoding, vision_distance=(1, 2),
+                       copy=False)
+        state = env.reset()
+        buffer = state
+        for step in range(300):
+            assert env.observation_space.contains(state), encoding
+            assert np.array_equal(state, reference(env.env)), encoding
+            state, _, done, _ = env.step(rng.integers(0, 4))
+            if done or step % 60 == 59:
+                state = env.reset()
+            assert state is buffer, "Buffer reallocated"
+
+
+def test_26_lazy_imports():
+    # Goal: making and stepping an env needs neither OpenCV nor the optional
+    # modules of the package
+    script = "\n".join([
+        "import sys",
+        "sys.modules['cv2'] = None",
+        "import gym, kang_gridworld",
+        "env = gym.make('kang-grid-v0')",
+        "env.reset()",
+        "env.step(3)",
+        "assert 'kang_gridworld.envs.async_vector' not in sys.modules",
+        "assert 'kang_gridworld.envs.profiling' not in sys.modules",
+    ])
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+
+def test_27_headless_recording():
+    # Goal: rgb_array frames need no GUI, and the recorder writes every
+    # episode's frames from its background thread
+    env = gym.make('kang-grid-v0', seed=1)
+    env.reset()
+    frame = env.render(mode='rgb_array')
+    grid = env.env.env
+    assert frame.dtype == np.uint8 and frame.shape == (5, 5, 3)
+    assert np.array_equal(frame, grid.get_representation(
+        True, dtype=np.uint8)), "Frame differs from the representation"
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = FrameRecorder(gym.make('kang-grid-v0', seed=2),
+                                 directory, scale=3)
+        lengths = []
+        rng = np.random.default_rng(0)
+        for _ in range(3):
+            recorder.reset()
+            steps = 1
+            done = False
+            while not done:
+                _, _, done, _ = recorder.step(rng.integers(0, 4))
+                steps += 1
+            lengths.append(steps)
+        recorder.close()
+
+        for episode, length in enumerate(lengths):
+            with np.load(f"{directory}/episode_{episode:06d}.npz") as data:
+                frames = data["frames"]
+            assert frames.shape == (length, 15, 15, 3), "Frames missing"
+        assert not (frames[0] == frames[-1]).all(), "Agent never moved"
+
+
+def test_28_world_storage():
+    # Goal: saved worlds and layout banks load back into consistent worlds,
+    # banks are memory mapped, and pickles are refused
+
+    def assert_same(first, second):
+        for name in ("representation", "blocks", "prox_map",
+                     "perm_contacts", "item_list"):
+            assert np.array_equal(getattr(first, name),
+                                  getattr(second, name)), name
+        assert np.array_equal(first.calculate_grid_map(),
+                              second.calculate_grid_map())
+        assert first.nearest_item(0, 0) == second.nearest_item(0, 0)
+
+    objects = [[1, True, 3, 2], [-1, True, 0, 4], [5, False, 2, 2],
+               [2, True, 1, 0]]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "world.npz")
+        grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, -2])
+        grid.place_agent(0, 0)
+        grid.move_agent(3)
+        grid.save_world(path)
+
+        loaded = Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, 0],
+                           compiled=True)
+        loaded.place_agent(1, 0)
+        loaded.load_world(path)
+        assert loaded.collision_penalty == -2
+        assert loaded.items.consumed[3], "Consumed item restored"
+        assert_same(grid, loaded)
+        assert loaded.move_agent(0) == -2
+
+        with open(os.path.join(directory, "world.p"), "wb") as world_file:
+            pickle.dump([objects, 0], world_file)
+        for bad_path in (world_file.name, path):
+            small = Gridworld((4, 4), KangGrid._ACTION_INFO, [[], 0])
+            try:
+                small.load_world(bad_path)
+            except Exception:
+                continue
+            assert False, "Loaded a pickle or a world of the wrong size"
+
+        rng = np.random.default_rng(0)
+        items = ItemStore.from_layouts(
+            sample_layouts(rng, 1000, (9, 7), 5), [1, -1, 2, -2, 3])
+        items.flags[::3, 2] = 0
+        path = os.path.join(directory, "bank.kgb")
+        write_bank(path, items, (9, 7), collision_penalty=-1)
+        bank = LayoutBank(path)
+        assert len(bank) == 1000 and bank.world_size == (9, 7)
+        assert isinstance(bank.items.x, np.memmap), "Bank not mapped"
+        assert np.array_equal(bank.items.as_matrix(), items.as_matrix())
+
+        world = Gridworld((9, 7), KangGrid._ACTION_INFO,
+                          [bank[0], bank.collision_penalty])
+        world.place_agent(0, 0)
+        for index in (999, 3, 500):
+            world.reset_layout(bank[index])
+            world.place_agent(0, 0)
+            fresh = Gridworld((9, 7), KangGrid._ACTION_INFO,
+                              [items[index], -1])
+            fresh.place_agent(0, 0)
+            assert_same(world, fresh)
+        del bank, world
+
+        # float64 rewards survive saving, also for consumed items
+        grid = Gridworld((5, 5), KangGrid._ACTION_INFO,
+                         [[[0.1, True, 1, 0], [0.3, True, 4, 4]], 0])
+        grid.place_agent(0, 0)
+        grid.move_agent(3)
+        path = os.path.join(directory, "exact.npz")
+        grid.save_world(path)
+        loaded = Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, 0])
+        loaded.load_world(path)
+        loaded.place_agent(0, 0)
+        assert loaded.prox_map[:, 0].tolist() == [0, 0.3]
+        assert loaded.items.reward[0] == 0, "Consumed reward not zeroed"
+        loaded.set_state(loaded.get_state()._replace(consumed=0))
+        assert loaded.move_agent(3) == 0.1, "Restored reward not exact"
+
+        path = os.path.join(directory, "exact.kgb")
+        write_bank(path, items[:2], (9, 7), rewards=[0.1, -1, 2, -2, 3])
+        bank = LayoutBank(path)
+        world = Gridworld((9, 7), KangGrid._ACTION_INFO, [bank[1], 0])
+        world.place_agent(0, 0)
+        assert world._reward.tolist() == [0.1, -1, 2, -2, 3]
+        del bank, world
+
+
+def test_29_replay_recording():
+    # Goal: replay shards hold exactly the transitions that were stepped,
+    # in compact columns, with the observations deduplicated
+    rng = np.random.default_rng(0)
+    for compress in (True, False):
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = ReplayRecorder(
+                gym.make('kang-grid-v0', seed=3, world_size=(4, 4)),
+                directory, chunk_size=37, compress=compress, max_pending=1)
+            expected = []
+            observation = recorder.reset()
+            for action in rng.integers(0, 4, 500).tolist():
+                next_observation, reward, done, _ = recorder.step(action)
+                expected.append((observation, action, reward,
+                                 next_observation, done,
+                                 recorder.unwrapped._get_agent_coords()))
+                observation = next_observation
+                if done:
+                    observation = recorder.reset()
+            recorder.close()
+            assert recorder.shards > 10
+            assert len(os.listdir(directory)) == recorder.shards
+
+            dataset = ReplayDataset(directory, seed=0)
+            assert len(dataset) == len(expected)
+            assert dataset.actions.dtype == np.int8
+            assert dataset.positions.dtype == np.int16
+            assert len(dataset.observations) < len(expected) / 2, \
+                "Observations not deduplicated"
+
+            transitions = dataset.transitions()
+            for name, index in (("observation", 0), ("action", 1),
+                                ("reward", 2), ("next_observation", 3),
+                                ("done", 4), ("position", 5)):
+                assert np.array_equal(
+                    transitions[name],
+                    np.array([row[index] for row in expected])), name
+
+            batch = dataset.sample(64)
+            assert batch["observation"].shape == (64, 3, 3, 3)
+            assert set(batch) == set(transitions)
+
+
+def test_30_state_snapshots():
+    # Goal: set_state(get_state()) rolls a world back exactly, whichever
+    # items were consumed or restored in between
+
+    def snapshot(grid):
+        return (grid.get_state(), grid.representation.copy(),
+                grid.return_vision(2, 2).copy(), grid.prox_map.copy(),
+                grid.calculate_grid_map(), grid.item_list,
+                grid.nearest_item(0, 0),
+                [grid.item_at(x, y) for x in range(6) for y in range(6)])
+
+    def assert_same(first, second):
+        assert first[0] == second[0]
+        for part, (left, right) in enumerate(zip(first[1:], second[1:])):
+            assert np.array_equal(left, right), part
+
+    rng = np.random.default_rng(1)
+    objects = [[1, True, 1, 0], [-1, True, 0, 2], [2, False, 2, 2],
+               [3, True, 1, 1], [-2, True, 3, 1], [1, True, 5, 5]]
+    for compiled in (False, True):
+        grid = Gridworld((6, 6), KangGrid._ACTION_INFO, [objects, -1],
+                         compiled=compiled)
+        grid.place_agent(0, 0)
+        grid.return_vision(2, 2)
+        states = [snapshot(grid)]
+        for _ in range(40):
+            grid.move_agent(int(rng.integers(4)))
+            states.append(snapshot(grid))
+        for index in rng.permutation(len(states)):
+            grid.set_state(states[index][0])
+            assert_same(snapshot(grid), states[index])
+
+        # replaying from a restored state matches a deep copy
+        grid.set_state(states[0][0])
+        clone = copy.deepcopy(grid)
+        for action in (3, 2, 1, 0, 3):
+            assert grid.move_agent(action) == clone.move_agent(action)
+        assert_same(snapshot(grid), snapshot(clone))
+
+        grid.reset_layout(objects)
+        grid.place_agent(0, 0)
+        try:
+            grid.set_state(states[0][0])
+        except Exception:
+            continue
+        assert False, "Restored a state of an earlier layout"
+
+    env = KangGrid(seed=0, observation="rgb")
+    env.reset()
+    state = env.get_state()
+    frame = env._observe()
+    for action in (3, 3, 2, 2, 1, 0):
+        env.step(action)
+    env.set_state(state)
+    assert np.array_equal(env._observe(), frame), "Stale observation"
+
+
+def test_31_multi_agent():
+    # Goal: simultaneous moves match a per-agent reference, agents never
+    # share cells or consume an item twice, and one agent behaves like the
+    # single-agent Gridworld
+
+    def reference(multi, actions, priority):
+        # the rules of MultiAgentGridworld, one agent at a time
+        size = multi.x_size
+        positions = list(zip(multi.x_agent.tolist(), multi.y_agent.tolist()))
+        targets, moving = [], []
+        for (x, y), action in zip(positions, actions):
+            dx, dy = KangGrid._ACTION_DEF[action]
+            ok = 0 <= x + dx < size and 0 <= y + dy < multi.y_size
+            ok = ok and multi.world.blocks[y + dy, x + dx] != 1
+            targets.append((x + dx, y + dy))
+            moving.append(ok)
+        changed = multi.exclusive
+        while changed:
+            changed = False
+            refused = set()
+            for agent, target in enumerate(targets):
+                if not moving[agent]:
+                    continue
+                rivals = [other for other, other_target in enumerate(targets)
+                          if moving[other] and other_target == target]
+                if min(rivals, key=priority.__getitem__) != agent:
+                    refused.add(agent)
+                if target in positions:
+                    occupant = positions.index(target)
+                    if occupant != agent and (
+                            not moving[occupant] or
+                            targets[occupant] == positions[agent]):
+                        refused.add(agent)
+            for agent in refused:
+                moving[agent], changed = False, True
+        rewards = [multi.world.collision_penalty] * len(targets)
+        taken = set()
+        for agent in sorted(range(len(targets)), key=priority.__getitem__):
+            if moving[agent]:
+                x, y = targets[agent]
+                rewards[agent] = 0
+                if targets[agent] not in taken:
+                    rewards[agent] = multi.world.representation[y, x]
+                    taken.add(targets[agent])
+        return rewards, moving
+
+    rng = np.random.default_rng(0)
+    layout = sample_layouts(rng, 1, (12, 12), 30)[0]
+    objects = [[reward, index % 7 != 0, x, y] for index, (reward, (x, y))
+               in enumerate(zip(rng.integers(-3, 4, 30), layout))]
+    for exclusive in (True, False):
+        multi = MultiAgentGridworld((12, 12), KangGrid._ACTION_INFO,
+                                    [objects, -1], np.zeros((1, 2)),
+                                    exclusive=exclusive, seed=1)
+        multi.place_agents(multi.sample_free_cells(60))
+        for _ in range(60):
+            actions = rng.integers(0, 4, 60)
+            state = multi.np_random.bit_generator.state
+            priority = multi.np_random.permutation(60)
+            multi.np_random.bit_generator.state = state
+            expected = reference(multi, actions.tolist(), priority.tolist())
+            rewards, collided = multi.move_agents(actions)
+            assert np.array_equal(rewards, expected[0])
+            assert np.array_equal(~collided, expected[1])
+            cells = multi.y_agent * 12 + multi.x_agent
+            if exclusive:
+                assert len(np.unique(cells)) == 60, "Agents share a cell"
+        consumed = multi.world.items.consumed
+        assert consumed.any()
+        assert not multi.world.representation[
+            multi.world.items.y[consumed], multi.world.items.x[consumed]].any()
+        assert (multi.world.item_index.cell_item >= 0).sum() == \
+            (~consumed).sum()
+        assert multi.prox_maps().shape == (60, 30 - 5, 3)
+        assert multi.return_vision(2, 1).shape == (60, 3, 5)
+
+    # swaps are refused, chains move together, stopped agents block
+    multi = MultiAgentGridworld((4, 1), KangGrid._ACTION_INFO,
+                                [[[5, True, 3, 0]], 0],
+                                [[0, 0], [1, 0], [2, 0]], seed=0)
+    rewards, collided = multi.move_agents([3, 1, 3])
+    assert rewards.tolist() == [0, 0, 5] and collided.tolist() == [1, 1, 0]
+    assert multi.move_agents([3, 3, 0])[1].tolist() == [0, 0, 1]
+    assert multi.x_agent.tolist() == [1, 2, 3]
+    assert multi.move_agents([3, 3, 3])[1].tolist() == [1, 1, 1]
+
+    # one agent is a Gridworld
+    grid = Gridworld((12, 12), KangGrid._ACTION_INFO, [objects, -1])
+    multi = MultiAgentGridworld((12, 12), KangGrid._ACTION_INFO,
+                                [objects, -1], [[0, 0]])
+    grid.place_agent(0, 0)
+    for action in rng.integers(0, 4, 200).tolist():
+        reward = grid.move_agent(action)
+        assert multi.move_agents([action])[0][0] == reward
+        assert np.array_equal(multi.prox_maps()[0], grid.prox_map)
+        assert np.array_equal(multi.return_vision(2, 2)[0],
+                              grid.return_vision(2, 2))
+
+
+def test_32_backend_parity():
+    # Goal: the numba backend follows exactly the trajectories of the numpy
+    # one, and falls back to numpy when numba is missing
+    try:
+        import numba  # noqa: F401
+        jit = "numba"
+    except ImportError:
+        jit = "numpy"
+
+    def world(grid):
+        return (grid._get_agent_coords(), grid.epoch, grid.prox_map,
+                grid.representation, grid.return_vision(2, 3),
+                grid.perm_contacts, grid.item_list,
+                grid.item_index.cell_item, grid.calculate_grid_map(),
+                grid.update_proximity_map((1, 1), speculative=True))
+
+    def assert_same(first, second):
+        for part, (left, right) in enumerate(zip(first, second)):
+            assert np.array_equal(left, right), part
+
+    rng = np.random.default_rng(4)
+    objects = [[1, True, 1, 0], [-1, True, 0, 2], [2, False, 2, 2],
+               [3, True, 1, 1], [-2, True, 3, 1], [1, True, 5, 4],
+               [0, False, 4, 0]]
+    for compiled in (False, True):
+        grids = [Gridworld((6, 5), KangGrid._ACTION_INFO, [objects, -1],
+                           compiled=compiled, backend=backend)
+                 for backend in ("numpy", "numba")]
+        assert grids[1].backend == jit
+        for grid in grids:
+            grid.place_agent(0, 0)
+            grid.return_vision(1, 1)
+        start = grids[1].get_state()
+        for step in range(300):
+            action = int(rng.integers(4))
+            rewards = [grid.move_agent(action) for grid in grids]
+            assert rewards[0] == rewards[1]
+            if step % 3:
+                assert_same(world(grids[0]), world(grids[1]))
+        assert grids[1].items.consumed.sum() > 2
+
+        grids[1].set_state(start)
+        clone = copy.deepcopy(grids[1])
+        assert clone.backend == jit
+        grids[0].reset_layout(objects)
+        grids[0].place_agent(0, 0)
+        for action in (3, 2, 2, 3, 0, 1):
+            assert grids[0].move_agent(action) == clone.move_agent(action)
+        assert_same(world(grids[0]), world(clone))
+
+    for observation in ("grid", "prox", "vision", "rgb"):
+        envs = [KangGrid(seed=5, world_size=(7, 6), number_of_objects=9,
+                         observation=observation, backend=backend)
+                for backend in ("numpy", "numba")]
+        for env in envs:
+            env.reset()
+        for action in rng.integers(0, 4, 400).tolist():
+            results = [env.step(action) for env in envs]
+            assert np.array_equal(results[0][0], results[1][0])
+            assert results[0][1:3] == results[1][1:3]
+            if results[0][2]:
+                assert np.array_equal(*(env.reset() for env in envs))
+
+    try:
+        Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, 0], backend="C")
+    except Exception:
+        pass
+    else:
+        assert False, "Unknown backend accepted"
+
+    script = "\n".join([
+        "import sys",
+        "sys.modules['numba'] = None",
+        "from kang_gridworld.envs import KangGrid",
+        "env = KangGrid(backend='numba', observation='prox')",
+        "assert env.env.backend == 'numpy'",
+        "env.reset()",
+        "env.step(3)",
+    ])
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+
+def test_33_fractional_rewards():
+    # Goal: rewards that are not integers reach the world unchanged
+    env = gym.make('kang-grid-v0', reward_map=(0.5, -1), seed=0)
+    env.reset()
+    grid = env.unwrapped.env
+    assert grid.items.reward.tolist() == [0.5, -1]
+    assert sorted(grid.representation[grid.representation != 0]) == [-1, 0.5]
+
+
+def test_34_exact_rewards():
+    # Goal: a reward of 0.1 is returned as 0.1, not as its float32 value
+    objects = [[0.1, True, 1, 0], [-0.3, True, 3, 3]]
+    for backend in ("numpy", "numba"):
+        grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [objects, 0],
+                         backend=backend)
+        grid.place_agent(0, 0)
+        assert grid.prox_map[:, 0].tolist() == [0.1, -0.3]
+        state = grid.get_state()
+        grid.move_agent(0)
+        assert grid.move_agent(3) == 0.1, "Reward not exact"
+        assert grid.prox_map[:, 0].tolist() == [0, -0.3]
+        grid.set_state(state)
+        assert grid.representation[0, 1] == 0.1, "Restored reward not exact"
+        assert grid.prox_map[:, 0].tolist() == [0.1, -0.3]
+
+    vec_env = KangGridVec(2, reward_map=(0.1, -0.3), seed=0,
+                          observation="prox")
+    observations = vec_env.reset()
+    assert (observations[..., 0] == [0.1, -0.3]).all()
+
+
+def test_35_shared_cells():
+    # Goal: objects sharing a cell are refused, leaving the world unchanged
+    grid = Gridworld((5, 5), KangGrid._ACTION_INFO, [[[1, True, 1, 0]], 0])
+    for objects in ([[1, True, 1, 0], [2, True, 1, 0]],
+                    [[1, True, 2, 2], [-1, False, 2, 2]]):
+        try:
+            grid.reset_layout(objects)
+        except Exception:
+            continue
+        assert False, "Placed two objects on one cell"
+    assert grid.item_list.tolist() == [[1, True, 1, 0]]
+    assert grid.representation[0, 1] == 1